@@ -0,0 +1,18 @@
+Feature: Channels
+  As a player
+  I want to talk with other players on channels
+  so I can chat with people wherever they are
+
+  Scenario: Broadcast after disconnect and reconnect
+    Given Alice and Bob are connected
+    And A mudslingcore.channels.Channel called "Chatter" exists
+    When Alice enters "@chanadd Chatter=chat"
+    And Bob enters "@chanadd Chatter=chat"
+    And Alice enters "chat Is anyone here?"
+    Then Bob should see "[Chatter] Alice: Is anyone here?"
+    When Bob disconnects
+    And Alice enters "chat Anyone still here?"
+    And Bob reconnects
+    And Alice enters "chat Welcome back."
+    Then Bob should see "[Chatter] Alice: Welcome back."
+    And Bob should not see "Anyone still here?"
@@ -9,3 +9,10 @@ Feature: Login to the game.
     Given The player "Bob" exists with password "test"
     When I enter "connect bob incorrect"
     Then I should see "Unknown player name or password."
+
+  Scenario: Login after the player's class changes
+    Given The player "Carol" exists with password "test"
+    When The class of player Carol is changed
+    Then The player registry should list player Carol once
+    When I enter "connect carol test"
+    Then I should see "Connected to player Carol."
@@ -61,4 +61,19 @@ Feature: Mail
     Then Alice should see "Mail sent to Bob."
     And Bob should see "You have new mail (1) from Alice."
     And Bob should see "First line of text"
-    And Bob should see "Second line of text"
\ No newline at end of file
+    And Bob should see "Second line of text"
+
+  Scenario: Filter mail by subject and body
+    Given Alice and Bob are connected
+    Then The mail database should use full-text search
+    When Alice enters "@mail/quick bob/Banana bread=Bring flour tomorrow"
+    And Alice enters "@mail/quick bob/Meeting=Discuss the banana budget"
+    And Alice enters "@mail/quick bob/Unrelated=Nothing to see"
+    And Bob enters "@mail 1-$ body:banana"
+    And Bob enters "@mail 1-$ subject:ban"
+    And Bob enters "@mail 1-$ body:flour"
+    Then Bob should see "@mail: 1 message (1-$ body:banana)"
+    And Bob should see "Meeting"
+    And Bob should see "@mail: 1 message (1-$ subject:ban)"
+    And Bob should see "Banana bread"
+    And Bob should see "@mail: 1 message (1-$ body:flour)"
@@ -0,0 +1,49 @@
+Feature: Entity repositories.
+
+  Scenario: Write-behind saves report their row IDs
+    Given A write-behind repository of things
+    When Things "apple", "pear" and "plum" are saved
+    Then The things table should have 0 rows
+    When The repository is flushed
+    Then The saves should report row IDs 1, 2 and 3
+    And The things table should have 3 rows
+
+  Scenario: A failed write-behind batch is rolled back
+    Given A write-behind repository of things
+    When Things "apple", "pear" and "apple" are saved
+    Then Flushing the repository should fail
+    And Every save should fail
+    And The things table should have 0 rows
+
+  Scenario: Deleting by field writes queued saves first
+    Given A write-behind repository of things
+    When Things "apple" and "pear" are saved
+    And Things named "apple" are deleted
+    Then The things table should have 1 row
+
+  Scenario: Cached lookups return the same instance until it changes
+    Given A cached repository of things
+    And Things "apple", "pear" and "plum" exist
+    When Thing 1 is looked up
+    Then Looking up thing 1 should give the same instance
+    When The looked up thing is saved again
+    Then Looking up thing 1 should give a fresh instance
+    When Thing 1 is looked up
+    And The cached things expire
+    Then Looking up thing 1 should give a fresh instance
+    When Thing 1 is looked up
+    And Things named "pear" are deleted
+    Then Looking up thing 1 should give a fresh instance
+    And Looking up thing 2 should find nothing
+    When Thing 3 is looked up
+    And The looked up thing is removed
+    Then Looking up thing 3 should find nothing
+
+  Scenario: Things are found in the order of their IDs
+    Given A cached repository of things
+    And Things "apple", "pear" and "plum" exist
+    Then Getting thing 2 should give a thing called "pear"
+    And Finding things 3, 1 and 2 should give "plum", "apple" and "pear"
+    When Thing 1 is looked up
+    Then Finding things 3, 1 and 2 should give "plum", "apple" and "pear"
+    And Finding things 2, 3 and 1 should give "pear", "plum" and "apple"
@@ -0,0 +1,49 @@
+Feature: Rooms
+  As a builder
+  I want room views, paths and searches to reflect changes to the world
+  so that players never see stale information
+
+  Scenario: Renamed objects in a room view
+    Given admin is connected
+    And A room called "Dusty Hall" exists
+    And A thing called "Red Ball" exists
+    And Red Ball is in Dusty Hall
+    And admin is in Dusty Hall
+    When admin enters "look"
+    Then admin should see "Dusty Hall"
+    And admin should see "Red Ball"
+    When admin enters "@rename Red Ball to Blue Ball"
+    And admin enters "@rename Dusty Hall to Clean Hall"
+    And admin's output is cleared
+    And admin enters "look"
+    Then admin should see "Clean Hall"
+    And admin should see "Blue Ball"
+    And admin should not see "Dusty Hall"
+    And admin should not see "Red Ball"
+
+  Scenario: Path after an exit is deleted
+    Given A room called "West Yard" exists
+    And A room called "East Yard" exists
+    And An exit called "east" leads from West Yard to East Yard
+    Then The path from West Yard to East Yard should be "east"
+    When east is deleted
+    Then There should be no path from West Yard to East Yard
+
+  Scenario: Find places directly in and nested within a room group
+    Given admin is connected
+    And A mudslingcore.rooms.RoomGroup called "Cache Tower" exists
+    And A mudslingcore.rooms.RoomGroup called "Upper Floor" exists
+    And A room called "Tower Attic" exists
+    And A room called "Tower Lobby" exists
+    And Upper Floor is in Cache Tower
+    And Tower Lobby is in Cache Tower
+    And Tower Attic is in Upper Floor
+    And admin is in Cache Tower
+    When admin enters "@find-place Tower in Cache Tower"
+    Then admin should see "Found Places"
+    And admin should see "Tower Lobby" before "Tower Attic"
+    When admin's output is cleared
+    And admin finds the place Tower Attic by ID in Cache Tower
+    Then admin should see "Found Places"
+    And admin should see "Tower Attic"
+    And admin should not see "Tower Lobby"
@@ -11,6 +11,14 @@ def enter_text(context, name, text):
     session.enter_text(text)
 
 
+@then('{name} should see "{first}" before "{second}"')
+@then("{name} should see '{first}' before '{second}'")
+def should_see_text_in_order(context, name, first, second):
+    output = get_session(name).output
+    assert get_session(name).output_contains(second, wait=0.1)
+    assert -1 < output.find(first) < output.find(second)
+
+
 @then('{name} should see "{text}"')
 @then("{name} should see '{text}'")
 def should_see_text(context, name, text, wait=0.1):
@@ -21,6 +29,17 @@ def should_see_text(context, name, text, wait=0.1):
         raise
 
 
+@when("{name}'s output is cleared")
+def clear_output(context, name):
+    get_session(name).reset_output_buffer()
+
+
+@then('{name} should not see "{text}"')
+@then("{name} should not see '{text}'")
+def should_not_see_text(context, name, text):
+    assert not get_session(name).output_contains(text, wait=0.1)
+
+
 @then('{name} should see "{text}" in {seconds} seconds')
 @then("{name} should see '{text}' in {seconds} seconds")
 @then('{name} should see "{text}" in {seconds} second')
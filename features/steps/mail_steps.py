@@ -0,0 +1,8 @@
+from behave import *
+
+from mudslingcore import mail
+
+
+@then('The mail database should use full-text search')
+def mail_db_uses_fts(context):
+    assert mail.mail_db.fts
@@ -52,4 +52,31 @@ def player_is_connected(context, name):
 @given("{name1} and {name2} are connected")
 def two_players_are_connected(context, name1, name2):
     player_is_connected(context, name1)
-    player_is_connected(context, name2)
\ No newline at end of file
+    player_is_connected(context, name2)
+
+
+@when("{name} disconnects")
+def player_disconnects(context, name):
+    get_session(name).detach()
+    logging.debug('Detached session "%s"' % name)
+
+
+@when("{name} reconnects")
+def player_reconnects(context, name):
+    player_is_connected(context, name)
+
+
+@when('The class of {obj} is changed')
+def class_is_changed(context, obj):
+    obj = context.objects[obj]
+    obj.change_class(obj._real_object().__class__)
+
+
+@then('The player registry should list {obj} once')
+def player_registered_once(context, obj):
+    player = context.objects[obj]._real_object()
+    assert player_registry.find_by_name(player.name) is player
+    same_id = [p for p in player_registry.players.itervalues()
+               if p.obj_id == player.obj_id]
+    assert same_id == [player]
+    assert player_registry.find_by_email(player.email).count(player) == 1
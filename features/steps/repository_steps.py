@@ -0,0 +1,183 @@
+import os
+import re
+import sqlite3
+
+from behave import *
+from crochet import run_in_reactor
+from twisted.internet.defer import DeferredList
+from schematics import types
+
+from mudsling.testing import *
+from mudsling.utils import db
+import mudsling.utils.string as str_utils
+
+
+class Thing(db.Model):
+    id = types.IntType()
+    name = types.StringType()
+    size = types.IntType()
+
+
+class ThingRepository(db.SchematicsSQLRepository):
+    model = Thing
+    table = 'things'
+    _entity_factory = Thing
+
+
+class CachedThingRepository(ThingRepository):
+    cache_size = 10
+    cache_ttl = 1
+
+
+class WriteBehindThingRepository(ThingRepository):
+    write_behind = True
+    # Long enough that only explicit flushes write anything.
+    write_behind_delay = 30
+
+
+@run_in_reactor
+def in_reactor(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _quoted(text):
+    return re.findall(r'"([^"]*)"', text)
+
+
+@given('A {kind} repository of things')
+def thing_repository(context, kind):
+    path = os.path.join(game().game_dir,
+                        'things-%s.sqlite' % str_utils.random_string(8))
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE things (id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                 ' name TEXT UNIQUE, size INTEGER)')
+    conn.commit()
+    conn.close()
+    database = in_reactor(db.ExternalRelationalDatabase,
+                          'sqlite:///' + path).wait(10)
+    repo_class = {'write-behind': WriteBehindThingRepository,
+                  'cached': CachedThingRepository}[kind]
+    repo = in_reactor(repo_class, database).wait(10)
+    # Write anything the scenario left queued before the pool goes away.
+    add_cleanup(CleanupCallback(
+        lambda: in_reactor(repo._background_flush).wait(10)))
+    add_cleanup(CleanupCallback(
+        lambda: in_reactor(database._pool.close).wait(10)))
+    add_cleanup(CleanupCallback(os.remove, path))
+    context.things_path = path
+    context.things = repo
+    context.saves = []
+
+
+@when('Things {names} are saved')
+def things_are_saved(context, names):
+    repo = context.things
+    context.saves.extend(in_reactor(
+        lambda: [repo.save(Thing.new(name=name, size=1))
+                 for name in _quoted(names)]).wait(10))
+
+
+@given('Things {names} exist')
+def things_exist(context, names):
+    # One at a time, so they get IDs in the order given.
+    for name in _quoted(names):
+        in_reactor(context.things.save, Thing.new(name=name, size=1)).wait(10)
+
+
+@when('Thing {id:d} is looked up')
+def thing_is_looked_up(context, id):
+    context.thing = in_reactor(context.things.find_by_id, id).wait(10)
+    assert context.thing is not None
+
+
+@when('The looked up thing is saved again')
+def looked_up_thing_is_saved(context):
+    in_reactor(context.things.save, context.thing).wait(10)
+
+
+@when('The looked up thing is removed')
+def looked_up_thing_is_removed(context):
+    in_reactor(context.things.delete, context.thing).wait(10)
+
+
+@when('The cached things expire')
+def cached_things_expire(context):
+    sleep(context.things.cache_ttl + 0.2)
+
+
+@when('The repository is flushed')
+def repository_is_flushed(context):
+    in_reactor(context.things.flush).wait(10)
+
+
+@when('Things named "{name}" are deleted')
+def things_are_deleted(context, name):
+    in_reactor(context.things.delete_where, 'name', name).wait(10)
+
+
+@then('Flushing the repository should fail')
+def flushing_should_fail(context):
+    try:
+        in_reactor(context.things.flush).wait(10)
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError('Flush succeeded.')
+
+
+def _save_results(context):
+    return in_reactor(DeferredList, context.saves,
+                      consumeErrors=True).wait(10)
+
+
+@then('The saves should report row IDs {ids}')
+def saves_report_row_ids(context, ids):
+    results = _save_results(context)
+    assert all(success for success, _ in results)
+    assert [r for _, r in results] == map(int, re.findall(r'\d+', ids))
+
+
+@then('Every save should fail')
+def every_save_fails(context):
+    results = _save_results(context)
+    assert results and not any(success for success, _ in results)
+
+
+@then('The things table should have {count:d} row')
+@then('The things table should have {count:d} rows')
+def things_table_rows(context, count):
+    conn = sqlite3.connect(context.things_path)
+    try:
+        rows = conn.execute('SELECT COUNT(*) FROM things').fetchone()[0]
+    finally:
+        conn.close()
+    assert rows == count, rows
+
+
+@then('Looking up thing {id:d} should give the same instance')
+def lookup_gives_same_instance(context, id):
+    assert in_reactor(context.things.find_by_id, id).wait(10) is context.thing
+
+
+@then('Looking up thing {id:d} should give a fresh instance')
+def lookup_gives_fresh_instance(context, id):
+    thing = in_reactor(context.things.find_by_id, id).wait(10)
+    assert thing is not None and thing is not context.thing
+
+
+@then('Looking up thing {id:d} should find nothing')
+def lookup_finds_nothing(context, id):
+    assert in_reactor(context.things.find_by_id, id).wait(10) is None
+
+
+@then('Getting thing {id:d} should give a thing called "{name}"')
+def get_by_id_gives_thing(context, id, name):
+    thing = in_reactor(context.things.get_by_id, id).wait(10)
+    assert isinstance(thing, Thing) and thing.name == name
+
+
+@then('Finding things {ids} should give {names}')
+def find_many_gives_things(context, ids, names):
+    ids = map(int, re.findall(r'\d+', ids))
+    things = in_reactor(context.things.find_many_by_id, ids).wait(10)
+    assert [t.name for t in things] == _quoted(names)
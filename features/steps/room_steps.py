@@ -0,0 +1,42 @@
+from behave import *
+
+from mudsling.testing import *
+
+from mudslingcore.rooms import Exit
+
+
+@given('An exit called "{name}" leads from {source} to {dest}')
+def exit_exists(context, name, source, dest):
+    source = context.objects[source]
+    exit = Exit.create(names=(name,))
+    add_cleanup(CleanupObj(exit))
+    exit.source = source
+    exit.dest = context.objects[dest]
+    source.add_exit(exit)
+    context.objects[name] = exit
+
+
+@when('{obj} is deleted')
+def object_is_deleted(context, obj):
+    context.objects[obj].delete()
+
+
+@when('{name} finds the place {obj} by ID in {group}')
+def find_place_by_id(context, name, obj, group):
+    get_session(name).enter_text('@find-place #%d in #%d' % (
+        context.objects[obj].obj_id, context.objects[group].obj_id))
+
+
+@then('The path from {source} to {dest} should be "{path}"')
+def path_should_be(context, source, dest, path):
+    exits = context.objects[source].path_to(context.objects[dest])
+    assert exits is not None
+    assert ', '.join(e.name for e in exits) == path
+
+
+@then('There should be no path from {source} to {dest}')
+def no_path(context, source, dest):
+    source = context.objects[source]
+    dest = context.objects[dest]
+    assert source.path_to(dest) is None
+    assert not source.can_reach(dest)
@@ -128,7 +128,8 @@ class MUDSling(MultiService):
 
         # Fire server startup hooks.
         self.invoke_hook('server_startup')
-        self.db.on_server_startup()
+        self.db.on_server_startup(
+            time_sliced=config.getboolean('Main', 'time slice startup hooks'))
 
         MultiService.startService(self)
 
@@ -2,13 +2,14 @@
 Message formatting system.
 """
 import random
-import copy
 import re
 import abc
+from collections import namedtuple
 
 import zope.interface
 
 import mudsling.utils.string as str_utils
+from mudsling.utils.sequence import LRUCache
 
 
 class InvalidMessage(Exception):
@@ -31,6 +32,14 @@ class FilteredPart(object):
 
 
 class RenderablePart(object):
+    """
+    A message part which renders itself for a viewer.
+
+    Rendering should depend only on how the viewer sees messages (see
+    L{mudsling.objects.PossessableObject.msg_view_key}), not on the viewer's
+    identity, since one rendering may be shared by all viewers with the same
+    view.
+    """
     __metaclass__ = abc.ABCMeta
     __slots__ = ()
 
@@ -68,6 +77,50 @@ class RenderList(RenderablePart):
                                       finalcommastr=self.finalcommastr)
 
 
+class ViewRenderCache(object):
+    """
+    Renders message parts once per distinct view, so that a message delivered
+    to many viewers is only formatted once for each group of viewers that
+    would see it identically.
+
+    Messages are keyed by identity unless an explicit key is given, so a cache
+    should only live as long as the messages it renders.
+    """
+    __slots__ = ('rendered',)
+
+    def __init__(self):
+        self.rendered = {}
+
+    def render(self, viewer, parts, key=None):
+        """
+        Render message parts for the viewer, reusing any rendering already
+        produced for a viewer with the same view.
+
+        :param viewer: The object for which to render the message.
+        :type viewer: mudsling.objects.PossessableObject
+
+        :param parts: The message parts to render.
+        :type parts: str or list or tuple
+
+        :param key: Optional key identifying the message. Defaults to the
+            identity of parts.
+
+        :rtype: str
+        """
+        if parts is None or isinstance(parts, basestring):
+            return parts
+        view = viewer.msg_view_key()
+        if view is None:
+            return viewer._format_msg(parts)
+        cache_key = (id(parts) if key is None else key, view)
+        try:
+            return self.rendered[cache_key]
+        except KeyError:
+            text = viewer._format_msg(parts)
+            self.rendered[cache_key] = text
+            return text
+
+
 class MessageParser(object):
     """
     The message parser is rather similar to L{string.Template}, and even uses
@@ -89,6 +142,9 @@ class MessageParser(object):
     }
     _re = re.compile(_pattern, re.IGNORECASE | re.VERBOSE)
 
+    #: Compiled templates keyed by template string.
+    _compiled = LRUCache(maxsize=2048)
+
     @classmethod
     def parse(cls, tpl, **keywords):
         """
@@ -120,50 +176,91 @@ class MessageParser(object):
         if not tpl:  # Blank messages should yield nothing.
             return None
 
+        subst = cls._subst_op
+        return [subst(op, keywords) if op.__class__ is Substitution else op
+                for op in cls.compile(tpl)]
+
+    @classmethod
+    def compile(cls, tpl):
+        """
+        Compile a template into a tuple of literal strings and L{Substitution}
+        operations. Results are cached by template string.
+
+        @type tpl: C{str}
+        @rtype: C{tuple}
+        """
+        ops = cls._compiled.get(tpl)
+        if ops is None:
+            ops = cls._compile(tpl)
+            cls._compiled[tpl] = ops
+        return ops
+
+    @classmethod
+    def _compile(cls, tpl):
         parts = cls._re.split(tpl)
-        out = []
+        ops = []
+        literal = []
         i = 0
         nparts = len(parts)
         while i < nparts:
             prefix = parts[i]
             if prefix:
-                out.append(prefix)
+                literal.append(prefix)
 
             if nparts > i + 1:
                 escaped, named, braced, invalid = parts[i + 1:i + 5]
-                if escaped is not None:
-                    out.append('$')
-                elif named is not None:
-                    out.append(cls.subst(named, keywords))
-                elif braced is not None:
-                    out.append(cls.subst(braced, keywords))
-                elif invalid is not None:
-                    # todo: Raise error? Substitute something else?
-                    out.append('$')
+                if escaped is not None or invalid is not None:
+                    # todo: Raise error on invalid? Substitute something else?
+                    literal.append('$')
+                else:
+                    if literal:
+                        ops.append(''.join(literal))
+                        literal = []
+                    ops.append(Substitution.from_expr(
+                        named if named is not None else braced))
             i += 5
 
-        return out
+        if literal:
+            ops.append(''.join(literal))
+        return tuple(ops)
 
     @classmethod
-    def subst(cls, name, keywords):
-        funcname = None
+    def _subst_op(cls, op, keywords):
         out = None
-        if '|' in name:
-            name, _, funcname = name.partition('|')
-        if '.' in name:
-            name, _, attr = name.partition('.')
-            obj = keywords.get(name, None)
+        if op.attr is not None:
+            obj = keywords.get(op.name, None)
             try:
-                out = getattr(obj, attr)
+                out = getattr(obj, op.attr)
             except AttributeError:
                 pass
-        elif name in keywords:
-            out = keywords[name]
+        else:
+            out = keywords.get(op.name, None)
         if out is not None:
-            if funcname is not None:
-                out = FilteredPart(out, funcname)
+            if op.funcname is not None:
+                out = FilteredPart(out, op.funcname)
             return out
-        return "${{{}}}".format(name)
+        return op.fallback
+
+    @classmethod
+    def subst(cls, name, keywords):
+        return cls._subst_op(Substitution.from_expr(name), keywords)
+
+
+class Substitution(namedtuple('Substitution', 'name attr funcname fallback')):
+    """
+    A single substitution operation in a compiled message template.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_expr(cls, expr):
+        funcname = attr = None
+        name = expr
+        if '|' in name:
+            name, _, funcname = name.partition('|')
+        if '.' in name:
+            name, _, attr = name.partition('.')
+        return cls(name, attr, funcname, "${{{}}}".format(name))
 
 
 class IHasMessages(zope.interface.Interface):
@@ -229,7 +326,8 @@ class Messages(object):
         @raise C{ValueError}: In the case of nested list messages.
         @raise L{InvalidMessage}: If resulting message is not a valid message.
 
-        @return: A message dictionary.
+        @return: A message dictionary. This may be the stored template dict
+            itself, so it must not be modified.
         @rtype: C{dict} or C{None}
         """
         msg = self.messages.get(key, None)
@@ -248,8 +346,8 @@ class Messages(object):
         if isinstance(msg, basestring):
             msg = {'*': msg}
         elif isinstance(msg, dict):
-            msg = copy.deepcopy(msg)
             if '*' not in msg:
+                msg = dict(msg)
                 msg['*'] = None
         else:
             raise InvalidMessage("Message is not str or dict")
@@ -284,15 +382,15 @@ class Messages(object):
         if msg is None:
             return None
 
+        # Templates are never modified, so a fresh dict is all we need.
+        parse = MessageParser._parse
+        out = {}
         for who, tpl in msg.iteritems():
-            msg[who] = MessageParser._parse(tpl, keywords)
+            if who in keywords:
+                who = keywords[who]
+            out[who] = parse(tpl, keywords)
 
-        for kw, val in keywords.iteritems():
-            if kw in msg:
-                msg[val] = msg[kw]
-                del msg[kw]
-
-        return msg
+        return out
 
 
 class HasMessages(object):
@@ -25,6 +25,25 @@ from mudsling.utils.hooks import hook, invoke_hook
 
 dbref_re = re.compile(r"#(\d+)")
 
+#: Whether each class renders messages using the standard implementations.
+_standard_rendering = {}
+
+#: Whether each class delivers messages using the standard msg.
+_standard_msg = {}
+
+#: Incremented whenever something that affects how objects name each other
+#: changes. Per-viewer name caches are discarded when it no longer matches.
+names_generation = 0
+
+
+def invalidate_names():
+    """
+    Discard all cached names. Call this when anything that affects the result
+    of names_for or name_for changes.
+    """
+    global names_generation
+    names_generation += 1
+
 
 # noinspection PyUnusedLocal
 def parse_dbref_literal(searcher, search):
@@ -58,6 +77,24 @@ literal_parsers = {
 }
 
 
+def _shares_rendered_msgs(obj):
+    """
+    Whether a message for the object can be rendered before delivery and
+    shared with other viewers: it must deliver messages with the standard msg
+    and have a view key.
+
+    :type obj: PossessableObject or ObjRef
+    :rtype: bool
+    """
+    cls = obj._real_object().__class__
+    try:
+        standard = _standard_msg[cls]
+    except KeyError:
+        standard = cls.msg.im_func is PossessableObject.msg.im_func
+        _standard_msg[cls] = standard
+    return standard and obj.msg_view_key() is not None
+
+
 class LockableObject(StoredObject):
     """
     Object that can have locks associated with it.
@@ -219,6 +256,7 @@ class NamedObject(LockableObject):
                 if not isinstance(n, basestring):
                     raise TypeError("Names and aliases must be strings.")
             self._names = newNames
+            invalidate_names()
         return oldNames
 
     def set_name(self, name):
@@ -256,6 +294,23 @@ class NamedObject(LockableObject):
         self.set_aliases(names[1:])
         return oldNames
 
+    def _name_cache(self):
+        """
+        Get this object's cache of names it has rendered for other objects,
+        discarding it if names have been invalidated since it was built.
+
+        :rtype: dict
+        """
+        cache = self.__dict__.get('_v_name_cache', None)
+        if cache is None or cache[0] != names_generation:
+            cache = (names_generation, {})
+            self._v_name_cache = cache
+        return cache[1]
+
+    @hook('before_deleted', 'after_class_changed')
+    def __invalidate_names(self, *a, **kw):
+        invalidate_names()
+
     def names_for(self, obj):
         """
         Returns a list of names representing the passed object as known by
@@ -266,9 +321,30 @@ class NamedObject(LockableObject):
         :rtype: tuple
         """
         try:
-            return obj.names
+            key = ('names', obj.obj_id)
         except (TypeError, AttributeError):
             return ()
+        cache = self._name_cache()
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        try:
+            names = obj.names
+        except (TypeError, AttributeError):
+            names = ()
+        cache[key] = names
+        return names
+
+    @classmethod
+    def has_standard_names_for(cls):
+        """
+        Whether this class names other objects using the default names_for,
+        which gives the same names regardless of the viewer.
+
+        :rtype: bool
+        """
+        return cls.names_for.im_func is NamedObject.names_for.im_func
 
     def name_for(self, obj):
         """
@@ -400,6 +476,7 @@ class PossessableObject(MessagedObject):
         if self.is_possessed:
             self.possessed_by.dispossess_object(self.ref())
         self.possessed_by = player
+        invalidate_names()
         self.on_possessed(player)
 
     def dispossessed(self):
@@ -408,6 +485,7 @@ class PossessableObject(MessagedObject):
         """
         previous = self.possessed_by
         del self.possessed_by
+        invalidate_names()
         if previous is not None:
             self.on_dispossessed(previous)
 
@@ -487,6 +565,31 @@ class PossessableObject(MessagedObject):
                 parts[i] = filter.render(parts[i])
         return ''.join(map(str, parts))
 
+    def msg_view_key(self):
+        """
+        Return a hashable key describing how this object renders messages.
+        Objects with equal keys render any message identically, allowing a
+        message to be rendered once and delivered to all of them.
+
+        Classes overriding name rendering get None (meaning this object's view
+        is unique) unless they also provide their own view key.
+
+        :rtype: tuple or None
+        """
+        cls = self.__class__
+        try:
+            standard = _standard_rendering[cls]
+        except KeyError:
+            standard = (
+                cls.has_standard_names_for()
+                and cls.name_for.im_func is PossessableObject.name_for.im_func
+                and (cls._format_msg.im_func
+                     is PossessableObject._format_msg.im_func))
+            _standard_rendering[cls] = standard
+        if not standard:
+            return None
+        return 'standard', self.has_perm("see object numbers")
+
     @hook('before_deleted')
     def __before_deleted(self):
         if self.is_possessed:
@@ -503,11 +606,23 @@ class PossessableObject(MessagedObject):
         :return: String name of passed object as known by this object.
         :rtype: str
         """
+        cached = self.has_standard_names_for()
+        if cached:
+            try:
+                key = ('name', obj.obj_id)
+            except (TypeError, AttributeError):
+                cached = False
+            else:
+                cache = self._name_cache()
+                if key in cache:
+                    return cache[key]
         name = super(PossessableObject, self).name_for(obj)
         try:
             if self.player.has_perm("see object numbers"):
                 name += " (#%d)" % obj.obj_id
         finally:
+            if cached:
+                cache[key] = name
             return name
 
     def read_line(self, callback, args=()):
@@ -555,6 +670,8 @@ class BaseObject(PossessableObject):
     #: :type: StoredObject or ObjRef
     owner = None
 
+    indexed_attrs = ('owner',)
+
     # Implement IHasCommands.
     private_commands = []
     public_commands = []
@@ -585,8 +702,8 @@ class BaseObject(PossessableObject):
         """
         # Use OrderedDict to preserve order of options. This is important
         # because the search string might use ordinals to avoid ambiguity.
-        strings = OrderedDict(zip(objlist, map(self.matchable_names_for,
-                                               objlist)))
+        names_for = self.matchable_names_for
+        strings = OrderedDict((o, names_for(o)) for o in objlist)
         return match_stringlists(search, strings, exact=exactOnly, err=err)
 
     def match_context(self, search, cls=None, err=False):
@@ -668,7 +785,16 @@ class BaseObject(PossessableObject):
         cls = cls or BaseObject
         if search.lower() == 'me' and self.isa(cls):
             return [self.ref()]
-        return self._match(search, self.game.db.descendants(cls))
+        db = self.game.db
+        if search.startswith('#') or not self.has_standard_names_for():
+            return self._match(search, db.iter_descendants(cls))
+        # Names are the same for every viewer, so the name index can narrow
+        # the candidates. Add the objects known by special names.
+        candidates = db.name_candidates(search, cls)
+        for obj in self.primary_context():
+            if obj.isa(cls) and obj not in candidates:
+                candidates.append(obj)
+        return self._match(search, candidates)
 
     def gained_input_capture(self, session):
         pass  # Here to implement IInputProcessor
@@ -1020,7 +1146,7 @@ class Object(BaseObject):
         dest_valid = self.game.db.is_valid(dest, Object)
 
         # Check for recursive moves.
-        if dest_valid and (this == dest or this in dest.locations()):
+        if dest_valid and (this == dest or dest.is_inside(this)):
             raise errors.RecursiveMove(this, source, dest)
 
         # Notify objects about the move about to happen, allowing them to raise
@@ -1036,6 +1162,7 @@ class Object(BaseObject):
                 self.location._contents.remove(this)
 
         self._location = dest
+        self._invalidate_locations()
 
         if dest_valid:
             if this not in dest._contents:
@@ -1050,13 +1177,54 @@ class Object(BaseObject):
         invoke_hook(self, 'after_moved', source, dest, by, via)
 
     def _location_walker(self):
-        location = self.location
-        try:
-            while location is not None:
-                yield location
-                location = location.location
-        except AttributeError:
-            pass
+        return iter(self._location_cache()[0])
+
+    def _location_cache(self):
+        """
+        Get the cached path of nested locations where this object resides.
+
+        The path is built from the location's own cached path, and is cleared
+        for the object and everything inside it whenever it moves.
+
+        :return: Tuple of the path (deepest to shallowest), the set of the
+            same locations, and a dict of location_of_type results.
+        :rtype: tuple
+        """
+        cache = self.__dict__.get('_v_location_cache', None)
+        if cache is None:
+            location = self.location
+            if location is None:
+                path = ()
+            else:
+                try:
+                    path = (location,) + location._location_cache()[0]
+                except AttributeError:  # Invalid or not an Object.
+                    path = (location,)
+            cache = (path, frozenset(path), {})
+            self._v_location_cache = cache
+        return cache
+
+    def _invalidate_locations(self):
+        """
+        Clear the cached location paths of this object and of all the objects
+        nested within it.
+        """
+        self.__dict__.pop('_v_location_cache', None)
+        pending = list(self._contents or ())
+        while pending:
+            obj = pending.pop()._real_object()
+            if obj is None:
+                continue
+            # Nothing inside an object can have a cached path unless the
+            # object itself has one.
+            if obj.__dict__.pop('_v_location_cache', None) is not None:
+                pending.extend(getattr(obj, '_contents', None) or ())
+
+    @hook('after_class_changed')
+    def __after_class_changed(self, *a, **kw):
+        # Nested objects may have cached location_of_type results involving
+        # the old class.
+        self._invalidate_locations()
 
     def locations(self):
         """
@@ -1067,16 +1235,31 @@ class Object(BaseObject):
         :return: List of nested locations, from deepest to shallowest.
         :rtype: list of Object
         """
-        return list(self._location_walker())
+        return list(self._location_cache()[0])
+
+    def is_inside(self, obj):
+        """
+        Whether this object resides in the given object at any level.
+
+        :rtype: bool
+        """
+        return obj in self._location_cache()[1]
 
     def location_of_type(self, cls):
         """
         Find the first location of a given type.
         """
-        for loc in self._location_walker():
-            if loc.isa(cls):
-                return loc
-        return None
+        by_type = self._location_cache()[2]
+        try:
+            return by_type[cls]
+        except KeyError:
+            found = None
+            for loc in self._location_cache()[0]:
+                if loc.isa(cls):
+                    found = loc
+                    break
+            by_type[cls] = found
+            return found
 
     def emit(self, msg, exclude=None, location=None):
         """
@@ -1140,11 +1323,18 @@ class Object(BaseObject):
         else:
             _msg = lambda o: msg
 
+        # Render each distinct message once per distinct view. Only receivers
+        # that would render it the standard way get it pre-rendered; others
+        # get the original parts.
+        renderer = mudsling.messages.ViewRenderCache()
         receivers = []
         for o in self.contents:
             if o in exclude or not o.is_valid(Object):
                 continue
-            o.msg(_msg(o))
+            message = _msg(o)
+            if o.is_possessed and _shares_rendered_msgs(o):
+                message = renderer.render(o, message)
+            o.msg(message)
             receivers.append(o)
 
         return receivers
@@ -1202,6 +1392,17 @@ class BasePlayer(BaseObject):
         if isinstance(password, utils.password.Password):
             self.password = password
 
+    def __setattr__(self, name, value):
+        super(BasePlayer, self).__setattr__(name, value)
+        if name == 'superuser':
+            # Superusers see object numbers in names (see has_perm).
+            invalidate_names()
+
+    def __delattr__(self, name):
+        super(BasePlayer, self).__delattr__(name)
+        if name == 'superuser':
+            invalidate_names()
+
     @classmethod
     def valid_player_name(cls, name):
         """
@@ -1267,10 +1468,16 @@ class BasePlayer(BaseObject):
 
         return player
 
-    @hook('before_deleted')
-    def __before_deleted(self):
+    @hook('before_deleted', 'before_class_changed')
+    def __unregister(self, *a, **kw):
         registry.players.unregister_player(self)
 
+    @hook('after_class_changed')
+    def __register(self, *a, **kw):
+        # The registry holds player instances, and the new class replaces
+        # this one with a new instance.
+        registry.players.register_player(self)
+
     def _set_names(self, name=None, aliases=None, names=None):
         """
         Players get special name handling. Specifically, they are registered
@@ -1361,6 +1568,7 @@ class BasePlayer(BaseObject):
         self.msg("{gConnected to player {c%s{g." % self.name)
         if self.possessing is None:
             self.msg("{rYou are not attached to any game object!")
+        invoke_hook(self, 'after_session_attached', session)
 
     def session_detached(self, session):
         """
@@ -1369,6 +1577,7 @@ class BasePlayer(BaseObject):
         """
         if self.session == session:
             del self.session
+            invoke_hook(self, 'after_session_detached', session)
 
     def redirect_input(self, where):
         if self.connected:
@@ -1590,10 +1799,12 @@ class BasePlayer(BaseObject):
             self.__roles = set()
         if role not in self.__roles:
             self.__roles.add(role)
+            invalidate_names()
 
     def remove_role(self, role):
         if role in self.__roles:
             self.__roles.remove(role)
+            invalidate_names()
         if len(self.__roles) == 0:
             del self.__roles
 
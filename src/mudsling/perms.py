@@ -1,6 +1,7 @@
 import logging
 
 from mudsling.errors import FailedMatch, AmbiguousMatch
+from mudsling.objects import invalidate_names
 
 class Role(object):
     name = ""
@@ -16,12 +17,14 @@ class Role(object):
     def add_perm(self, perm):
         if perm not in self.perms:
             self.perms.add(perm)
+            invalidate_names()
             return True
         return False
 
     def remove_perm(self, perm):
         if perm in self.perms:
             self.perms.remove(perm)
+            invalidate_names()
             return True
         return False
 
@@ -30,6 +33,7 @@ class Role(object):
 
     def reset_perms(self, perms=()):
         self.perms = set(perms)
+        invalidate_names()
 
 
 def create_default_roles(defaults):
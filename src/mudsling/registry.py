@@ -76,25 +76,35 @@ class ClassRegistry(object):
 class PlayerRegistry(object):
     """
     Player registry expects one player per name, but multiple players per
-    email address.
+    email address. Names and emails are matched case-insensitively.
+
+    Players are tracked by identity rather than object ID, since they are
+    registered as soon as they are named, before they get their ID.
+
+    @ivar players: Registered players keyed by C{id()}.
+    @ivar names: Players keyed by case-folded name.
+    @ivar emails: Dicts of players (keyed by C{id()}) keyed by case-folded
+        email.
     """
     def __init__(self):
-        self.players = []
+        self.players = {}
         self.names = {}
         self.emails = {}
+        self._keys = {}  # id(player) -> (folded names, folded email)
+
+    @staticmethod
+    def _fold(key):
+        return key.lower() if isinstance(key, basestring) else key
 
     def find_by_name(self, name):
-        if name in self.names:
-            return self.names[name]
-        return None
+        return self.names.get(self._fold(name), None)
 
     def find_by_email(self, email):
         """
         @rtype: C{list}
         """
-        if email in self.emails:
-            return self.emails[email]
-        return []
+        players = self.emails.get(self._fold(email), {})
+        return sorted(players.itervalues(), key=lambda p: p.obj_id)
 
     def register_player(self, player):
         """
@@ -105,14 +115,19 @@ class PlayerRegistry(object):
         """
         #: @type: mudsling.objects.BasePlayer
         player = player._real_object()
-        if player in self.players:
+        key = id(player)
+        if key in self.players:
             self.unregister_player(player)
-        self.players.append(player)
-        for name in player.names:
+        self.players[key] = player
+        names = tuple(self._fold(name) for name in player.names)
+        for name in names:
             self.names[name] = player
-        if player.email not in self.emails:
-            self.emails[player.email] = []
-        self.emails[player.email].append(player)
+        email = self._fold(player.email)
+        if email in self.emails:
+            self.emails[email][key] = player
+        else:
+            self.emails[email] = {key: player}
+        self._keys[key] = (names, email)
 
     def register_players(self, players):
         for player in players:
@@ -122,20 +137,20 @@ class PlayerRegistry(object):
         """
         @type player: L{mudsling.objects.BasePlayer}
         """
-        names_to_delete = []
         #: @type: mudsling.objects.BasePlayer
         player = player._real_object()
-        if player in self.players:
-            self.players.remove(player)
-        for name, p in self.names.iteritems():
-            if p == player:
-                names_to_delete.append(name)
-        for name in names_to_delete:
-            del self.names[name]
-
-        for email, players in self.emails.iteritems():
-            if p in players:
-                self.emails[email].remove(p)
+        key = id(player)
+        if self.players.pop(key, None) is None:
+            return
+        names, email = self._keys.pop(key)
+        for name in names:
+            if self.names.get(name, None) is player:
+                del self.names[name]
+        players = self.emails.get(email, None)
+        if players is not None:
+            players.pop(key, None)
+            if not players:
+                del self.emails[email]
 
     def reregister_player(self, player):
         self.unregister_player(player)
@@ -1,20 +1,27 @@
 import copy_reg
 import types
+import weakref
 import logging
 import os
 import time
 import inspect
+import heapq
+from bisect import bisect_left, insort
 from collections import namedtuple
+from itertools import imap, chain, islice
 
-from twisted.internet.task import LoopingCall
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall, cooperate
 import zope.interface
 
-from mudsling.match import match_objlist
+from mudsling.match import match_objlist, parse_ordinal
 from mudsling import errors
 from mudsling import registry
 from mudsling import pickler
 from mudsling.events import HasSubscribableEvents
-from mudsling.utils.hooks import invoke_hook
+from mudsling.utils.hooks import invoke_hook, implements_hook
+from mudsling.utils import specifications as specs
+import mudsling.utils.string.ansi as ansi
 
 
 _all_refs = set()
@@ -25,6 +32,23 @@ do not use it for anything else.
 """
 
 
+_db_generation = 0
+"""
+Incremented whenever objects are added to or removed from the database, or a
+database is loaded. ObjRef instances cache a pointer to their object which is
+only trusted while this value is unchanged.
+"""
+
+
+def _changed_objects():
+    global _db_generation
+    _db_generation += 1
+
+
+def _null_ref():
+    return None
+
+
 # Support pickling methods.
 def reduce_method(m):
     o = m.__self__
@@ -116,7 +140,8 @@ class ObjRef(PersistentSlots):
     objects to which they refer, but they can out-live the objects to which
     they refer and keep the reference count low.
     """
-    __slots__ = ('_id',)
+    __slots__ = ('_id', '_v_cache')
+    _transient_vars = ['_v_cache']
     db = None  # This dependency is injected immediately after the db loads.
 
     @property
@@ -127,27 +152,37 @@ class ObjRef(PersistentSlots):
         """Compatibility with old namedtuple implementation"""
         obj = super(ObjRef, cls).__new__(cls)
         obj._id = id
+        object.__setattr__(obj, '_v_cache', None)
         return obj
 
     def __setstate__(self, state):
         """Compatibility with old namedtuple implementation"""
         _all_refs.add(state['_id'])
+        object.__setattr__(self, '_v_cache', None)
         if isinstance(state, bool) and not state:
             return
         return super(ObjRef, self).__setstate__(state)
 
     def _real_object(self):
-        return self.db._get_object(self._id)
+        # The cached (generation, weakref) pair is valid as long as no objects
+        # have been added to or removed from the database since it was taken.
+        cache = self._v_cache
+        if cache is not None and cache[0] == _db_generation:
+            return cache[1]()
+        obj = self.db._get_object(self._id)
+        ref = weakref.ref(obj) if obj is not None else _null_ref
+        object.__setattr__(self, '_v_cache', (_db_generation, ref))
+        return obj
 
     def __getattr__(self, name):
         return getattr(self._real_object(), name)
 
     def __setattr__(self, name, value):
         if name == '_id':
-            obj = self
+            object.__setattr__(self, '_v_cache', None)
+            object.__setattr__(self, name, value)
         else:
-            obj = self._real_object()
-        object.__setattr__(obj, name, value)
+            setattr(self._real_object(), name, value)
 
     def __delattr__(self, name):
         delattr(self._real_object(), name)
@@ -198,9 +233,15 @@ class ObjRef(PersistentSlots):
     def is_valid(self, cls=None):
         """
         Proxy version of Database.is_valid().
+
+        Any object found by _real_object() is registered in the database, so
+        only the class needs checking.
         """
         try:
-            return self.db.is_valid(self._real_object(), cls)
+            o = self._real_object()
+            if o is None:
+                return False
+            return cls is None or isinstance(o, cls)
         except TypeError:
             return False
 
@@ -219,6 +260,149 @@ class ObjRef(PersistentSlots):
         return zope.interface.providedBy(self._real_object())
 
 
+class AttributeIndex(object):
+    """
+    Maps the values of an object attribute to the IDs of the objects having
+    those values.
+
+    @ivar attr: The name of the indexed attribute.
+    @ivar multi: If true, list, tuple and set values are indexed under each of
+        their elements instead of as a whole.
+    @ivar transform: Optional callable applied to each value before indexing
+        and lookup, such as C{str.lower}.
+    @ivar value_of: Optional callable returning the value to index for an
+        object, for when it differs from the attribute whose assignment
+        triggers reindexing.
+    """
+    __slots__ = ('attr', 'multi', 'transform', 'value_of', 'ids_by_key',
+                 'keys_by_id')
+
+    def __init__(self, attr, multi=False, transform=None, value_of=None):
+        self.attr = attr
+        self.multi = multi
+        self.transform = transform
+        self.value_of = value_of
+        self.ids_by_key = {}
+        self.keys_by_id = {}
+
+    def value_for(self, obj):
+        if self.value_of is None:
+            return getattr(obj, self.attr, None)
+        try:
+            return self.value_of(obj)
+        except AttributeError:
+            return None
+
+    def keys_for_value(self, value):
+        if self.multi and isinstance(value, (list, tuple, set, frozenset)):
+            values = value
+        else:
+            values = (value,)
+        transform = self.transform
+        keys = []
+        for v in values:
+            if transform is not None:
+                try:
+                    v = transform(v)
+                except (TypeError, AttributeError, ValueError):
+                    continue
+            try:
+                hash(v)
+            except TypeError:  # Unhashable values are not indexed.
+                continue
+            keys.append(v)
+        return keys
+
+    def add(self, obj_id, value):
+        self.remove(obj_id)
+        keys = self.keys_for_value(value)
+        if keys:
+            self.keys_by_id[obj_id] = keys
+            for key in keys:
+                if key in self.ids_by_key:
+                    self.ids_by_key[key].add(obj_id)
+                else:
+                    self.ids_by_key[key] = {obj_id}
+                    self._key_added(key)
+
+    def remove(self, obj_id):
+        for key in self.keys_by_id.pop(obj_id, ()):
+            ids = self.ids_by_key.get(key, None)
+            if ids is not None:
+                ids.discard(obj_id)
+                if not ids:
+                    del self.ids_by_key[key]
+                    self._key_removed(key)
+
+    def _key_added(self, key):
+        pass
+
+    def _key_removed(self, key):
+        pass
+
+    def lookup(self, value):
+        """
+        Get the IDs of objects indexed under the given value.
+        @rtype: C{set}
+        """
+        ids = set()
+        for key in self.keys_for_value(value):
+            ids.update(self.ids_by_key.get(key, ()))
+        return ids
+
+
+def normalize_name(name):
+    """
+    Reduce a name to the form used for name matching: lower case without ANSI.
+    """
+    return ansi.strip_ansi(name.lower())
+
+
+def _object_names(obj):
+    return obj.names
+
+
+class NameIndex(AttributeIndex):
+    """
+    Index of normalized object names, supporting exact and prefix lookups.
+    """
+    __slots__ = ('_sorted_keys',)
+
+    def __init__(self, *a, **kw):
+        super(NameIndex, self).__init__(*a, **kw)
+        self._sorted_keys = None
+
+    # The sorted keys are built on the first prefix lookup, and then kept in
+    # order as keys come and go.
+
+    def _key_added(self, key):
+        if self._sorted_keys is not None:
+            insort(self._sorted_keys, key)
+
+    def _key_removed(self, key):
+        keys = self._sorted_keys
+        if keys is not None:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def lookup_prefix(self, prefix):
+        """
+        Get the IDs of objects with any name starting with the prefix.
+        @rtype: C{set}
+        """
+        prefix = self.transform(prefix)
+        keys = self._sorted_keys
+        if keys is None:
+            keys = self._sorted_keys = sorted(self.ids_by_key)
+        ids = set()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            ids.update(self.ids_by_key[keys[i]])
+            i += 1
+        return ids
+
+
 class InvalidCallback(errors.Error):
     pass
 
@@ -269,6 +453,9 @@ class StoredObject(Persistent, HasSubscribableEvents):
     @cvar db: Reference to the containing database. Set upon DB load.
 
     @ivar obj_id: The unique object ID for this object in the Database.
+
+    @cvar indexed_attrs: Names of attributes the database should index for
+        instances of this class. See L{Database.create_index}.
     """
 
     #: @type: mudsling.storage.Database
@@ -277,6 +464,8 @@ class StoredObject(Persistent, HasSubscribableEvents):
     #: @type: int
     obj_id = 0
 
+    indexed_attrs = ()
+
     def __init__(self, **kwargs):
         """
         Initialization at this level is only run when the object is first
@@ -300,6 +489,18 @@ class StoredObject(Persistent, HasSubscribableEvents):
         """
         super(StoredObject, self).__init__()
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        db = self.db
+        if db is not None and name in db.indexes:
+            db.update_index(self, name)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        db = self.db
+        if db is not None and name in db.indexes:
+            db.update_index(self, name)
+
     def __str__(self):
         return str(self.obj_id)
 
@@ -428,6 +629,11 @@ class Database(Persistent):
         load of the database.
     @type type_registry: dict
 
+    @ivar indexes: Attribute indexes keyed by attribute name. Rebuilt on each
+        load of the database from the indexed_attrs of registered classes.
+        Indexes created by L{create_index} must be created again after load.
+    @type indexes: dict
+
     @ivar settings: Key/val store for arbitrary data. Can be used to store
         settings or other values that are DB-specific. Otherwise, coder should
         use the config system.
@@ -437,7 +643,8 @@ class Database(Persistent):
     @type game: mudsling.core.MUDSling
     """
 
-    _transient_vars = ['type_registry', 'game', 'filepath', 'recyclable_ids']
+    _transient_vars = ['type_registry', 'game', 'filepath', 'recyclable_ids',
+                       'descendant_classes', 'indexes']
 
     initialized = False
     max_obj_id = 0
@@ -450,6 +657,12 @@ class Database(Persistent):
 
     type_registry = {}
 
+    #: Cache of registered classes descending from each queried ancestor.
+    #: @type: dict
+    descendant_classes = None
+
+    indexes = {}
+
     settings = {}
 
     #: @type: mudsling.server.MUDSling
@@ -472,6 +685,7 @@ class Database(Persistent):
             db = cls(filepath)
         db.filepath = filepath
         ObjRef.db = db
+        _changed_objects()
         logging.info('Running post-load database hooks...')
         start = time.clock()
         db.on_loaded(game)
@@ -492,6 +706,8 @@ class Database(Persistent):
         self.roles = []
         self.tasks = {}
         self.type_registry = {}
+        self.descendant_classes = {}
+        self.indexes = {}
         self.settings = {}
 
     def on_loaded(self, game):
@@ -516,6 +732,8 @@ class Database(Persistent):
 
     def rebuild_type_registry(self):
         self.type_registry = {}
+        self.descendant_classes = {}
+        self.indexes = {}
 
         import gc
         toggle_gc = gc.isenabled()
@@ -529,24 +747,76 @@ class Database(Persistent):
             gc.collect()
             gc.enable()
 
-    def on_server_startup(self):
+    def on_server_startup(self, time_sliced=False):
         """
         Run once per server start after everything is loaded and ready.
+
+        :param time_sliced: If True, object startup hooks are dispatched in
+            cooperative batches once the reactor is running instead of all at
+            once before it starts.
         """
         for task in self.tasks.itervalues():
             task.server_startup()
-        for obj in self.objects.itervalues():
-            invoke_hook(obj, 'server_startup')
+        if time_sliced:
+            work = self.iter_hook_batches('server_startup')
+            reactor.callWhenRunning(cooperate, work)
+        else:
+            self.invoke_hook_on_all('server_startup')
 
     def on_server_shutdown(self):
         """
         Run just prior to server shutdown.
         """
-        for obj in self.objects.itervalues():
-            invoke_hook(obj, 'server_shutdown')
+        self.invoke_hook_on_all('server_shutdown')
         for task in self.tasks.itervalues():
             task.server_shutdown()
 
+    hook_batch_size = 200
+
+    def classes_implementing_hook(self, hook_name):
+        """
+        Get the registered classes which have objects in the database and
+        implement the named hook somewhere in their MRO.
+
+        :param hook_name: The name of the hook.
+        :rtype: list
+        """
+        return [cls for cls, ids in self.type_registry.iteritems()
+                if ids and implements_hook(cls, hook_name)]
+
+    def iter_hook_batches(self, hook_name, *a, **kw):
+        """
+        Invoke a hook on every object whose class implements it, grouped by
+        class and yielding after each batch of L{hook_batch_size} objects.
+
+        Objects are looked up when their batch is reached, so objects deleted
+        or reclassed in the meantime are skipped.
+
+        :param hook_name: The name of the hook to invoke.
+        :param a: Positional arguments to pass to hook implementations.
+        :param kw: Keyword arguments to pass to hook implementations.
+
+        :rtype: generator
+        """
+        size = self.hook_batch_size
+        for cls in self.classes_implementing_hook(hook_name):
+            obj_ids = list(self.type_registry.get(cls, ()))
+            for i in xrange(0, len(obj_ids), size):
+                for obj_id in obj_ids[i:i + size]:
+                    obj = self.objects.get(obj_id, None)
+                    if obj is not None and obj.__class__ is cls:
+                        invoke_hook(obj, hook_name, *a, **kw)
+                yield cls
+
+    def invoke_hook_on_all(self, hook_name, *a, **kw):
+        """
+        Synchronously invoke a hook on every object whose class implements it.
+
+        @see: L{iter_hook_batches}
+        """
+        for _ in self.iter_hook_batches(hook_name, *a, **kw):
+            pass
+
     def save(self, filepath=None):
         filepath = filepath or self.filepath
         logging.info("Dumping database to %s..." % filepath)
@@ -614,6 +884,12 @@ class Database(Persistent):
         cls = obj.__class__
         if cls not in self.type_registry:
             self.type_registry[cls] = set()
+            for ancestor, classes in self.descendant_classes.iteritems():
+                if issubclass(cls, ancestor):
+                    classes.add(cls)
+            for c in cls.__mro__:
+                for attr in c.__dict__.get('indexed_attrs', ()):
+                    self.create_index(attr)
         if obj.obj_id not in self.type_registry[cls]:
             self.type_registry[cls].add(obj.obj_id)
 
@@ -654,7 +930,10 @@ class Database(Persistent):
     def register_object(self, obj, force_id=None):
         obj.obj_id = force_id or self._allocate_obj_id()
         self.objects[obj.obj_id] = obj
+        _changed_objects()
         self._add_to_type_registry(obj)
+        for index in self.indexes.itervalues():
+            index.add(obj.obj_id, index.value_for(obj))
 
     def unregister_object(self, obj):
         """
@@ -667,6 +946,8 @@ class Database(Persistent):
             raise errors.InvalidObject(obj)
 
         obj = obj._real_object()
+        for index in self.indexes.itervalues():
+            index.remove(obj.obj_id)
         try:
             self.type_registry[obj.__class__].remove(obj.obj_id)
         except (ValueError, KeyError):
@@ -675,6 +956,7 @@ class Database(Persistent):
             del self.objects[obj.obj_id]
         except KeyError:
             logging.error("%s missing from objects dictionary!" % obj)
+        _changed_objects()
 
     def is_valid(self, obj, cls=None):
         """
@@ -684,13 +966,14 @@ class Database(Persistent):
         If class is provided, it also checks if the object is a descendant of
         the specified class.
         """
-        if isinstance(obj, int):
-            valid = obj in self.objects
-        elif isinstance(obj, StoredObject):
-            valid = (obj.obj_id in self.objects
-                     and self.objects[obj.obj_id] == obj)
-        elif isinstance(obj, ObjRef):
+        # Most common case first.
+        if isinstance(obj, ObjRef):
             return obj.is_valid(cls)
+        elif isinstance(obj, StoredObject):
+            # Equality with the registered object is equality of IDs.
+            valid = obj.obj_id in self.objects
+        elif isinstance(obj, int):
+            valid = obj in self.objects
         else:
             return False
 
@@ -699,6 +982,26 @@ class Database(Persistent):
 
         return valid
 
+    def descendant_classes_of(self, ancestor):
+        """
+        Get the registered classes which have the given class in their type
+        hierarchy (including the class itself).
+
+        The result is computed on first request and then maintained as new
+        classes enter the type registry, so it must not be modified.
+
+        @param ancestor: The class whose registered descendants to retrieve.
+
+        @rtype: set
+        """
+        try:
+            return self.descendant_classes[ancestor]
+        except KeyError:
+            classes = set(cls for cls in self.type_registry
+                          if issubclass(cls, ancestor))
+            self.descendant_classes[ancestor] = classes
+            return classes
+
     def descendants(self, ancestor):
         """
         Return a list of all objects with the specified class in their type
@@ -708,11 +1011,23 @@ class Database(Persistent):
 
         @rtype: list
         """
-        descendants = []
-        for cls, children in self.type_registry.iteritems():
-            if issubclass(cls, ancestor):
-                descendants.extend(children)
-        return map(ObjRef, descendants)
+        return list(self.iter_descendants(ancestor))
+
+    def iter_descendants(self, ancestor):
+        """
+        Iterate over all objects with the specified class in their type
+        heirarchy, without building a list of them first.
+
+        The iterator reads the type registry directly, so objects must not be
+        created or deleted while it is being consumed.
+
+        @param ancestor: The class whose descendants to retrieve.
+
+        @rtype: iterator
+        """
+        registry = self.type_registry
+        return imap(ObjRef, chain.from_iterable(
+            registry[cls] for cls in self.descendant_classes_of(ancestor)))
 
     def children(self, parent):
         """
@@ -722,15 +1037,247 @@ class Database(Persistent):
 
         @rtype: list
         """
-        if parent in self.type_registry:
-            return map(ObjRef, self.type_registry[parent])
-        return []
+        return map(ObjRef, self.type_registry.get(parent, ()))
+
+    def create_index(self, attr, multi=False, transform=None, value_of=None,
+                     index_class=AttributeIndex):
+        """
+        Index the named attribute of all objects. The index is maintained as
+        objects are registered, unregistered, or have the attribute assigned
+        or deleted. Changes made by mutating a value in place are not seen.
+
+        Index stored attribute names (such as '_location' rather than the
+        'location' property), since only assignments trigger maintenance.
+
+        If an index for the attribute already exists, it is returned as-is.
+
+        @param attr: The name of the attribute to index.
+        @param multi: Index list, tuple and set values by their elements.
+        @param transform: Callable applied to values before indexing.
+        @param value_of: Callable returning the value to index for an object.
+        @param index_class: The L{AttributeIndex} class to use.
+
+        @rtype: L{AttributeIndex}
+        """
+        if attr in self.indexes:
+            return self.indexes[attr]
+        index = index_class(attr, multi=multi, transform=transform,
+                            value_of=value_of)
+        for obj_id, obj in self.objects.iteritems():
+            index.add(obj_id, index.value_for(obj))
+        self.indexes[attr] = index
+        return index
+
+    def drop_index(self, attr):
+        self.indexes.pop(attr, None)
+
+    def update_index(self, obj, attr):
+        """
+        Refresh the index entry for an attribute of a registered object.
+        """
+        if self.objects.get(obj.obj_id, None) is obj:
+            index = self.indexes[attr]
+            index.add(obj.obj_id, index.value_for(obj))
+
+    @property
+    def name_index(self):
+        """
+        The index of all object names, built on first use.
+        @rtype: L{NameIndex}
+        """
+        return self.create_index('_names', multi=True,
+                                 transform=normalize_name,
+                                 value_of=_object_names,
+                                 index_class=NameIndex)
+
+    def name_candidates(self, search, cls=None):
+        """
+        Find objects with a name that equals or starts with the search text,
+        ignoring case and ANSI, with or without any leading ordinal.
+
+        Only names held in the index are considered: searches by object ID
+        (#123) and viewers whose names for objects differ from the objects'
+        own names (see L{BaseObject.has_standard_names_for}) must match against
+        the full list of objects instead.
+
+        @param search: The search text.
+        @param cls: Optional class whose descendants to consider.
+
+        @rtype: list of L{ObjRef}
+        """
+        search = normalize_name(search)
+        index = self.name_index
+        ids = index.lookup_prefix(search)
+        subject = parse_ordinal(search)[1]
+        if subject != search:
+            ids |= index.lookup_prefix(subject)
+        if cls is not None:
+            classes = self.descendant_classes_of(cls)
+            ids = [i for i in ids
+                   if i in self.objects
+                   and self.objects[i].__class__ in classes]
+        return map(ObjRef, sorted(ids))
+
+    def find(self, cls=None, **criteria):
+        """
+        Find objects whose attributes have the given values, optionally
+        limited to descendants of a class.
+
+        Indexed attributes narrow the candidates; other criteria are compared
+        against each remaining candidate. For multi-valued indexes, a
+        criterion matches objects whose value contains it.
+
+        >>> db.find(cls=Thing, owner=player)
+
+        @param cls: Optional class whose descendants to search.
+        @param criteria: Attribute names and the values they must have.
+
+        @rtype: list of L{ObjRef}
+        """
+        ids = None
+        unindexed = []
+        for attr, value in criteria.iteritems():
+            if attr in self.indexes:
+                matched = self.indexes[attr].lookup(value)
+                ids = matched if ids is None else ids & matched
+                if not ids:
+                    return []
+            else:
+                unindexed.append((attr, value))
+
+        classes = self.descendant_classes_of(cls) if cls is not None else None
+        if ids is not None:
+            candidates = (self.objects[i] for i in ids if i in self.objects)
+        elif classes is not None:
+            candidates = (self.objects[i] for c in classes
+                          for i in self.type_registry[c])
+        else:
+            candidates = self.objects.itervalues()
+
+        found = []
+        for obj in candidates:
+            if classes is not None and obj.__class__ not in classes:
+                continue
+            for attr, value in unindexed:
+                if getattr(obj, attr, None) != value:
+                    break
+            else:
+                found.append(obj.ref())
+        return found
+
+    def query(self, spec=None, cls=None, order_by=None, reverse=False,
+              offset=0, limit=None):
+        """
+        Find the objects satisfying a specification, optionally limited to
+        descendants of a class.
+
+        Attribute specifications on indexed attributes (and their conjunctions
+        and disjunctions) narrow the candidates to check, otherwise the type
+        registry or the whole database is scanned. Candidates are checked
+        against the full specification as the results are consumed.
+
+        >>> db.query(AttributeSpecification('owner', player), cls=Thing,
+        ...          order_by='name', limit=20)
+
+        @param spec: The L{specs.Specification} objects must satisfy.
+        @param cls: Optional class whose descendants to search.
+        @param order_by: An attribute name or key function of the object to
+            order the results by. Unordered results are in object ID order.
+        @param reverse: Reverse the result order.
+        @param offset: The number of leading results to skip.
+        @param limit: The maximum number of results.
+
+        @return: Iterator over the matching objects.
+        @rtype: iterator of L{ObjRef}
+        """
+        found = self._query_candidates(spec, cls)
+        if spec is not None:
+            found = (obj for obj in found if spec.satisfied_by(obj))
+
+        if order_by is not None:
+            if isinstance(order_by, basestring):
+                attr = order_by
+                order_by = lambda o: getattr(o, attr, None)
+            if limit is not None:
+                pick = heapq.nlargest if reverse else heapq.nsmallest
+                found = pick(offset + limit, found, key=order_by)
+            else:
+                found = sorted(found, key=order_by, reverse=reverse)
+        elif reverse:
+            found = reversed(list(found))
+
+        stop = None if limit is None else offset + limit
+        return (obj.ref() for obj in islice(found, offset, stop))
+
+    def _query_candidates(self, spec, cls):
+        """
+        Choose the cheapest access path for a query.
+
+        @rtype: iterator of L{StoredObject}
+        """
+        ids = None if spec is None else self._spec_ids(spec)
+        classes = self.descendant_classes_of(cls) if cls is not None else None
+        objects = self.objects
+        if ids is not None:
+            candidates = (objects[i] for i in sorted(ids) if i in objects)
+            if classes is not None:
+                candidates = (o for o in candidates
+                              if o.__class__ in classes)
+        elif classes is not None:
+            ids = sorted(chain.from_iterable(self.type_registry[c]
+                                             for c in classes))
+            candidates = (objects[i] for i in ids if i in objects)
+        else:
+            candidates = (objects[i] for i in sorted(objects))
+        return candidates
+
+    def _spec_ids(self, spec):
+        """
+        Get a set of object IDs containing every object that can satisfy a
+        specification, or None if the indexes cannot tell.
+
+        @rtype: C{set} or C{None}
+        """
+        if isinstance(spec, specs.AttributeSpecification):
+            index = self.indexes.get(spec.attr, None)
+            if index is None or index.value_of is not None:
+                return None
+            if spec.op == '=' and not index.multi:
+                values = (spec.value,)
+            elif (spec.op == 'in' and not index.multi
+                  and isinstance(spec.value, (list, tuple, set, frozenset))):
+                values = spec.value
+            elif spec.op == 'contains' and index.multi:
+                values = (spec.value,)
+            else:
+                return None
+            ids = set()
+            for value in values:
+                if not index.keys_for_value(value):
+                    return None  # Value cannot be looked up in the index.
+                ids |= index.lookup(value)
+            return ids
+        elif isinstance(spec, specs.AndSpecification):
+            left = self._spec_ids(spec.left)
+            right = self._spec_ids(spec.right)
+            if left is None or right is None:
+                return right if left is None else left
+            return left & right
+        elif isinstance(spec, specs.OrSpecification):
+            left = self._spec_ids(spec.left)
+            if left is None:
+                return None
+            right = self._spec_ids(spec.right)
+            if right is None:
+                return None
+            return left | right
+        return None
 
     def match_descendants(self, search, cls, varname="names", exactOnly=False):
         """
         Convenience method for matching the descendants of a given class.
         """
-        objlist = self.descendants(cls)
+        objlist = self.iter_descendants(cls)
         return match_objlist(search, objlist, varname, exactOnly)
 
     def match_children(self, search, cls, varname="names", exactOnly=False):
@@ -229,6 +229,8 @@ class CleanupObj(Cleanup):
 
     def do(self):
         for obj in self.objects:
+            if not obj.is_valid():
+                continue  # Deleted by the test itself.
             logging.debug('Cleanup object %s (#%d)' % (obj.name, obj.obj_id))
             obj.delete()
 
@@ -1,9 +1,13 @@
+from __future__ import absolute_import
 import re
 import os
+import time
 import logging
+import threading
 import inspect
 from urlparse import urlparse
 import collections
+import functools
 
 import yoyo
 import yoyo.connections
@@ -12,18 +16,22 @@ import sqlite3
 import unqlite
 
 import sqlalchemy.dialects as dialects
-from sqlalchemy import table, column
+from sqlalchemy import table, column, bindparam
 from sqlalchemy.sql import not_, and_, or_
+from sqlalchemy.sql.elements import ClauseElement
 import sqlalchemy
 
 import schematics.models
 import schematics.types as schematics_types
 
 from twisted.enterprise import adbapi
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.defer import Deferred, DeferredLock, succeed
 
 import mudsling.errors
 from mudsling.utils.object import dict_inherit
+from mudsling.utils.sequence import LRUCache
 from mudsling.utils import specifications as specs
 
 
@@ -59,6 +67,59 @@ def migrate(db_uri, migrations_path):
     conn.close()
 
 
+def sqlite_table_exists(filepath, table_name):
+    """
+    Check whether an SQLite database has a table (or virtual table).
+
+    :param filepath: The path to the SQLite database file.
+    :type filepath: str
+    :param table_name: The name of the table to look for.
+    :type table_name: str
+
+    :rtype: bool
+    """
+    conn = sqlite3.connect(filepath)
+    try:
+        cursor = conn.execute("SELECT 1 FROM sqlite_master"
+                              " WHERE type = 'table' AND name = ?",
+                              (table_name,))
+        return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def fts_match_query(text, prefix=False):
+    """
+    Build an FTS5 MATCH expression requiring every word in the text.
+
+    Words are quoted so that user input cannot use FTS query syntax.
+
+    :param text: The words to search for.
+    :type text: str
+    :param prefix: Whether words also match longer terms they begin.
+    :type prefix: bool
+
+    :rtype: str
+    """
+    suffix = '*' if prefix else ''
+    return ' '.join('"%s"%s' % (word.replace('"', '""'), suffix)
+                    for word in text.split())
+
+
+def like_pattern(text):
+    """
+    Build a LIKE pattern matching values containing the text. Use with
+    ``ESCAPE '\\'``.
+
+    :param text: The text to search for.
+    :type text: str
+
+    :rtype: str
+    """
+    text = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%%%s%%' % text
+
+
 DB_DRIVERS = {}
 
 
@@ -238,23 +299,41 @@ class RelationalDatabaseDriver(DatabaseDriver):
         if cls.dialect is None and cls.uri_scheme is not None:
             cls.dialect = dialects.registry.load(cls.uri_scheme)()
 
+    # Default connection pool size, overridden by the pool_min and pool_max
+    # options.
+    pool_min = 3
+    pool_max = 5
+
     @classmethod
-    def connect(cls, uri):
+    def connect(cls, uri, options=None):
         """
         Generate a Twisted ADAPI connection pool and return it.
 
         :type uri: urlparse.ParseResult
+        :param options: Driver options, such as pool_min and pool_max.
+        :type options: dict
+
+        :rtype: MeteredConnectionPool
         """
-        a, kw = cls._connect_parameters(uri)
-        return adbapi.ConnectionPool(cls.dbapi_module, *a, **kw)
+        options = options or {}
+        if len(inspect.getargspec(cls._connect_parameters).args) > 2:
+            a, kw = cls._connect_parameters(uri, options)
+        else:
+            # Drivers written before options existed.
+            a, kw = cls._connect_parameters(uri)
+        kw.setdefault('cp_min', int(options.get('pool_min', cls.pool_min)))
+        kw.setdefault('cp_max', int(options.get('pool_max', cls.pool_max)))
+        return MeteredConnectionPool(cls.dbapi_module, *a, **kw)
 
     @classmethod
-    def _connect_parameters(cls, uri):
+    def _connect_parameters(cls, uri, options=None):
         """
         Return the positional and keyword arguments to pass to the connect
         method for the database connection.
 
         :type uri: urlparse.ParseResult
+        :param options: Driver options. Drivers may omit this parameter.
+        :type options: dict
 
         :rtype: tuple of (tuple, dict)
         """
@@ -268,18 +347,141 @@ class SQLiteDriver(RelationalDatabaseDriver):
     dbapi_module = 'sqlite3'
     uri_scheme = 'sqlite'
 
+    # Prepared statements kept by each pooled connection, reused whenever the
+    # same SQL string is executed again.
+    cached_statements = 256
+
+    # Pragmas set on each new connection, in order. Each may be overridden by
+    # an option of the same name; an empty value leaves SQLite's default.
+    # WAL lets readers proceed while another connection writes, and
+    # synchronous=NORMAL is safe with WAL. cache_size is in KiB when negative.
+    pragmas = (
+        ('busy_timeout', '5000'),
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', '-16000'),
+        ('mmap_size', '268435456'),
+    )
+
+    _pragma_value_re = re.compile(r'^-?\w+$')
+
     @classmethod
-    def _connect_parameters(cls, uri):
+    def _connect_parameters(cls, uri, options=None):
+        pragmas = cls.connection_pragmas(options or {})
         kw = {
             'check_same_thread': False,
-            'cp_openfun': cls._configure_connection,
+            'cached_statements': cls.cached_statements,
+            'cp_openfun': functools.partial(cls._configure_connection,
+                                            pragmas),
         }
         return (uri.path,), kw
 
+    @classmethod
+    def connection_pragmas(cls, options):
+        """
+        Get the pragmas to set on new connections, given the driver options.
+
+        :type options: dict
+        :rtype: list of tuple
+        """
+        pragmas = []
+        for name, default in cls.pragmas:
+            value = str(options.get(name, default)).strip()
+            if not value:
+                continue
+            if cls._pragma_value_re.match(value) is None:
+                raise ValueError('Invalid value for SQLite pragma %s: %r'
+                                 % (name, value))
+            pragmas.append((name, value))
+        return pragmas
+
     @staticmethod
-    def _configure_connection(conn):
+    def apply_pragmas(conn, pragmas):
+        """
+        :type conn: sqlite3.Connection
+        :type pragmas: list of tuple
+        """
+        for name, value in pragmas:
+            conn.execute('PRAGMA %s = %s' % (name, value))
+
+    @classmethod
+    def _configure_connection(cls, pragmas, conn):
         conn.row_factory = sqlite3.Row
         conn.text_factory = str
+        cls.apply_pragmas(conn, pragmas)
+
+
+class MeteredConnectionPool(adbapi.ConnectionPool):
+    """
+    A connection pool that keeps utilization statistics: how many interactions
+    it has run, how long they waited for a connection, and how long they ran.
+    """
+
+    def __init__(self, *a, **kw):
+        adbapi.ConnectionPool.__init__(self, *a, **kw)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.calls = 0
+            self.wait_time = 0.0
+            self.max_wait = 0.0
+            self.run_time = 0.0
+
+    def runInteraction(self, interaction, *args, **kw):
+        return adbapi.ConnectionPool.runInteraction(
+            self, self._metered, time.time(), interaction, *args, **kw)
+
+    def _metered(self, txn, queued, interaction, *args, **kw):
+        start = time.time()
+        try:
+            return interaction(txn, *args, **kw)
+        finally:
+            end = time.time()
+            with self._stats_lock:
+                self.calls += 1
+                self.wait_time += start - queued
+                self.max_wait = max(self.max_wait, start - queued)
+                self.run_time += end - start
+
+    def stats(self):
+        """
+        Get a snapshot of the pool's utilization. Times are in seconds.
+
+        :rtype: dict
+        """
+        threadpool = self.threadpool
+        with self._stats_lock:
+            calls = self.calls
+            avg = (lambda t: t / calls) if calls else (lambda t: 0.0)
+            return {
+                'min': self.min,
+                'max': self.max,
+                'connections': len(self.connections),
+                'busy': len(threadpool.working),
+                'idle': len(threadpool.waiters),
+                'queued': threadpool.q.qsize(),
+                'calls': calls,
+                'avg_wait': avg(self.wait_time),
+                'max_wait': self.max_wait,
+                'avg_run': avg(self.run_time),
+            }
+
+
+def db_options(items, prefix='db '):
+    """
+    Collect database driver options from configuration (name, value) pairs.
+    Options are the names with the given prefix, minus the prefix, with spaces
+    changed to underscores. For example, 'db pool max' becomes pool_max.
+
+    :param items: The (name, value) pairs, such as from a config section.
+    :type items: list of tuple
+
+    :rtype: dict
+    """
+    return {name[len(prefix):].strip().replace(' ', '_'): value
+            for name, value in items if name.startswith(prefix)}
 
 
 class EntityRepository(object):
@@ -289,12 +491,62 @@ class EntityRepository(object):
     """
     _entity_factory = tuple
 
+    # Identity map: when cache_size is non-zero, entities looked up by ID are
+    # kept (up to cache_size of them, for cache_ttl seconds, or indefinitely
+    # if cache_ttl is None) and the same instance is returned by later lookups
+    # until it is saved, deleted or expires.
+    cache_size = 0
+    cache_ttl = 300
+
     def __init__(self, db):
         """
         :param db: The database to interact with.
         :type db: ExternalRelationalDatabase
         """
         self.db = db
+        self._cache = LRUCache(self.cache_size) if self.cache_size else None
+
+    def _cache_key(self, id_):
+        return id_
+
+    def cached(self, id_):
+        """
+        Get an entity from the identity map, if it is there and fresh.
+
+        :return: The cached entity, or None.
+        """
+        if self._cache is None:
+            return None
+        key = self._cache_key(id_)
+        hit = self._cache.get(key, None)
+        if hit is None:
+            return None
+        expires, entity = hit
+        if expires is not None and expires <= reactor.seconds():
+            del self._cache[key]
+            return None
+        return entity
+
+    def cache(self, id_, entity):
+        """
+        Put an entity in the identity map, if this repository has one.
+        """
+        if self._cache is not None and entity is not None:
+            expires = (None if self.cache_ttl is None
+                       else reactor.seconds() + self.cache_ttl)
+            self._cache[self._cache_key(id_)] = (expires, entity)
+
+    def uncache(self, *ids):
+        """
+        Drop entities from the identity map.
+        """
+        if self._cache is not None:
+            for id_ in ids:
+                self._cache.pop(self._cache_key(id_), None)
+
+    def clear_cache(self):
+        if self._cache is not None:
+            self._cache.clear()
 
     def all(self, limit=None):
         """
@@ -314,13 +566,18 @@ class EntityRepository(object):
 
         :rtype: twisted.internet.defer.Deferred
         """
+        entity = self.cached(id_)
+        if entity is not None:
+            returnValue(entity)
         results = yield self._get(id_)
         if len(results):
             if callable(self._entity_factory):
-                entity = yield self._factory(results[0])
-                returnValue(entity)
+                entities = yield self._factory(results[:1])
+                entity = entities[0]
             else:
-                returnValue(results[0])
+                entity = results[0]
+            self.cache(id_, entity)
+            returnValue(entity)
         else:
             returnValue(None)
 
@@ -421,6 +678,22 @@ class SchematicsSQLRepository(EntityRepository):
     # need to take more steps to determine if a record is new or not.
     db_generates_ids = True
 
+    # Write-behind mode: saves and deletes are queued, then written together
+    # in one transaction after write_behind_delay seconds, or as soon as
+    # write_behind_max writes are pending. Reads do not see queued writes, so
+    # call flush() first where that matters. Pending writes are also flushed
+    # when the reactor shuts down.
+    write_behind = False
+    write_behind_delay = 0.05
+    write_behind_max = 500
+
+    def __init__(self, db):
+        super(SchematicsSQLRepository, self).__init__(db)
+        self._pending_writes = []
+        self._flush_call = None
+        self._write_lock = DeferredLock()
+        self._shutdown_trigger = None
+
     _schematics_to_sqlalchemy = {
         schematics_types.StringType: sqlalchemy.String,
         schematics_types.BooleanType: sqlalchemy.Boolean,
@@ -500,6 +773,13 @@ class SchematicsSQLRepository(EntityRepository):
         """:rtype: sqlalchemy.sql.dml.Delete"""
         return self.schema.delete(*a, **kw)
 
+    def _shape(self, *key):
+        """
+        Build a cache key for the shape of one of this repository's statements.
+        See :meth:`ExternalRelationalDatabase.compile`.
+        """
+        return (self.__class__, self.table) + key
+
     def _insert(self, **kw):
         """
         Inserts a row in this repository's table.
@@ -508,11 +788,20 @@ class SchematicsSQLRepository(EntityRepository):
 
         :rtype: twisted.internet.defer.Deferred
         """
-        return self.db.interaction(self._insert_interaction, **kw)
+        sql, params = self.db.compile(*self._insert_shape(kw))
+        return self.db.interaction(self._insert_interaction, sql, params)
+
+    def _insert_shape(self, fields):
+        """
+        :return: A builder, cache key, and parameters for inserting a row.
+        :rtype: tuple
+        """
+        columns = tuple(sorted(fields.iterkeys()))
+        return (lambda: self.schema.insert().values(
+                    {c: bindparam(c) for c in columns}),
+                self._shape('insert', columns), fields)
 
-    def _insert_interaction(self, txn, **kw):
-        query = self.schema.insert().values(**kw)
-        sql, params = self.db.compile(query)
+    def _insert_interaction(self, txn, sql, params):
         txn.execute(sql, params)
         return txn.lastrowid
 
@@ -521,7 +810,9 @@ class SchematicsSQLRepository(EntityRepository):
 
     def _get(self, id):
         id = getattr(self.model, self.id_field).to_primitive(id)
-        return self._query(self._select().where(self.id_column == id))
+        return self._query(
+            lambda: self._select().where(self.id_column == bindparam('id')),
+            cache_key=self._shape('get'), params={'id': id})
 
     @property
     def _entity_factory(self):
@@ -546,6 +837,21 @@ class SchematicsSQLRepository(EntityRepository):
         :rtype: twisted.internet.defer.Deferred
         """
         id = getattr(entity, self.id_field, None)
+        if id is not None:
+            self.uncache(id)
+        try:
+            r = yield self._write_entity(entity, id)
+        finally:
+            if id is not None:
+                # Also drop anything read from the database mid-write.
+                self.uncache(id)
+        returnValue(r)
+
+    @inlineCallbacks
+    def _write_entity(self, entity, id):
+        if self.write_behind:
+            r = yield self._queue_save(entity, id)
+            returnValue(r)
         if id is not None and not self.db_generates_ids:
             # Non-db ID is present -- we don't know if it's insert or update.
             # So we need to check for existing record.
@@ -559,32 +865,191 @@ class SchematicsSQLRepository(EntityRepository):
             r = yield self._update_entity(entity)
         returnValue(r)
 
+    def _entity_fields(self, entity):
+        return {k: v for k, v in entity.to_primitive().iteritems()
+                if k not in self.ignore_fields}
+
     def _insert_entity(self, entity):
-        fields = {k: v for k, v in entity.to_primitive().iteritems()
-                  if k not in self.ignore_fields}
-        return self._insert(**fields)
+        return self._insert(**self._entity_fields(entity))
 
     def _update_entity(self, entity):
-        id_col = self.id_column
-        fields = {k: v for k, v in entity.to_primitive().iteritems()
-                  if k not in self.ignore_fields}
-        id = fields.get(self.id_field, None)
-        stmt = self._update().values(**fields).where(id_col == id)
-        return self.db.operation(stmt)
+        build, key, params = self._update_shape(self._entity_fields(entity))
+        return self.db.operation(build, cache_key=key, params=params)
 
-    def delete(self, entity):
+    def _update_shape(self, fields):
         """
-        :type entity: schematics.models.Model
+        :return: A builder, cache key, and parameters for updating a row.
+        :rtype: tuple
+        """
+        columns = tuple(sorted(fields.iterkeys()))
+        # Bind names must differ from the columns being set.
+        params = {'set_' + k: v for k, v in fields.iteritems()}
+        params['where_id'] = fields.get(self.id_field, None)
+        return (lambda: self._update().values(
+                    {c: bindparam('set_' + c) for c in columns}
+                ).where(self.id_column == bindparam('where_id')),
+                self._shape('update', columns), params)
+
+    def _delete_shape(self, entity):
+        """
+        :return: A builder, cache key, and parameters for deleting a row.
+        :rtype: tuple
         """
         id_ = getattr(entity, self.id_field, None)
         assert id_ is not None
         id_ = getattr(self.model, self.id_field).to_primitive(id_)
-        stmt = self._delete().where(self.id_column == id_)
-        return self.db.operation(stmt)
+        return (lambda: self._delete().where(
+                    self.id_column == bindparam('id')),
+                self._shape('delete'), {'id': id_})
+
+    def delete(self, entity):
+        """
+        :type entity: schematics.models.Model
+        """
+        build, key, params = self._delete_shape(entity)
+        id_ = getattr(entity, self.id_field)
+        self.uncache(id_)
+        if self.write_behind:
+            d = self._queue_write('write', self.db.compile(build, key, params))
+        else:
+            d = self.db.operation(build, cache_key=key, params=params)
+        d.addBoth(self._uncache_after, id_)
+        return d
+
+    def _uncache_after(self, result, *ids):
+        self.uncache(*ids)
+        return result
 
     def delete_where(self, field_name, value, op='='):
-        stmt = self._delete().where(self.where(field_name, value, op))
-        return self.db.operation(stmt)
+        shape, where, params = self._where_shape(field_name, value, op)
+        d = self.flush() if self.write_behind else succeed(None)
+        d.addCallback(lambda _: self.db.operation(
+            lambda: self._delete().where(where()),
+            cache_key=self._shape('delete', *shape), params=params))
+        # Any cached entity might have been deleted.
+        self.clear_cache()
+        d.addBoth(self._clear_cache_after)
+        return d
+
+    def _clear_cache_after(self, result):
+        self.clear_cache()
+        return result
+
+    def _queue_save(self, entity, id):
+        fields = self._entity_fields(entity)
+        insert = self.db.compile(*self._insert_shape(fields))
+        if id is None:
+            return self._queue_write('insert', insert)
+        update = self.db.compile(*self._update_shape(fields))
+        if self.db_generates_ids:
+            return self._queue_write('write', update)
+        else:
+            # Update if the row exists, or else insert it.
+            return self._queue_write('upsert', update, insert)
+
+    def _queue_write(self, kind, *statements):
+        """
+        Queue a write for the next write-behind batch.
+
+        :param kind: 'write' for a statement that can be batched with others
+            like it, 'insert' for an insert whose new row ID is the result, or
+            'upsert' for an update followed by an insert if no row changed.
+        :param statements: The compiled (sql, params) to execute.
+
+        :return: Fires with the result once the batch is committed.
+        :rtype: twisted.internet.defer.Deferred
+        """
+        d = Deferred()
+        self._pending_writes.append((kind, statements, d))
+        if self._shutdown_trigger is None:
+            # Only registered while writes are pending, so idle repositories
+            # leave nothing behind in the reactor.
+            self._shutdown_trigger = reactor.addSystemEventTrigger(
+                'before', 'shutdown', self._shutdown_flush)
+        if len(self._pending_writes) >= self.write_behind_max:
+            self._background_flush()
+        elif self._flush_call is None:
+            self._flush_call = reactor.callLater(self.write_behind_delay,
+                                                 self._background_flush)
+        return d
+
+    def _background_flush(self):
+        d = self.flush()
+        # Failures are logged and passed to each queued write's Deferred.
+        d.addErrback(lambda failure: None)
+        return d
+
+    def _shutdown_flush(self):
+        self._shutdown_trigger = None
+        return self._background_flush()
+
+    def flush(self):
+        """
+        Write all queued saves and deletes in one transaction. Batches are
+        written in the order they were flushed.
+
+        :return: Fires once the queued writes are committed, or fails if they
+            were rolled back.
+        :rtype: twisted.internet.defer.Deferred
+        """
+        if self._flush_call is not None:
+            if self._flush_call.active():
+                self._flush_call.cancel()
+            self._flush_call = None
+        if self._shutdown_trigger is not None:
+            reactor.removeSystemEventTrigger(self._shutdown_trigger)
+            self._shutdown_trigger = None
+        writes, self._pending_writes = self._pending_writes, []
+        if not writes:
+            return self._write_lock.run(succeed, None)
+        d = self._write_lock.run(self.db.interaction, self._write_batch,
+                                 [w[:2] for w in writes])
+        d.addCallbacks(self._batch_written, self._batch_failed,
+                       callbackArgs=(writes,), errbackArgs=(writes,))
+        return d
+
+    @staticmethod
+    def _write_batch(txn, writes):
+        results = []
+        batch_sql = None
+        batch = []
+        for kind, statements in writes:
+            if kind == 'write':
+                sql, params = statements[0]
+                if sql != batch_sql:
+                    if batch:
+                        txn.executemany(batch_sql, batch)
+                    batch_sql, batch = sql, []
+                batch.append(params)
+                results.append(None)
+                continue
+            if batch:
+                txn.executemany(batch_sql, batch)
+                batch_sql, batch = None, []
+            if kind == 'upsert':
+                txn.execute(*statements[0])
+                if txn.rowcount:
+                    results.append(None)
+                    continue
+                statements = statements[1:]
+            txn.execute(*statements[0])
+            results.append(txn.lastrowid)
+        if batch:
+            txn.executemany(batch_sql, batch)
+        return results
+
+    @staticmethod
+    def _batch_written(results, writes):
+        for (kind, statements, d), result in zip(writes, results):
+            d.callback(result)
+
+    @staticmethod
+    def _batch_failed(failure, writes):
+        logging.error('Write-behind batch of %d writes failed: %s',
+                      len(writes), failure.getErrorMessage())
+        for kind, statements, d in writes:
+            d.errback(failure)
+        return failure
 
     @inlineCallbacks
     def all(self, limit=None):
@@ -675,17 +1140,43 @@ class SchematicsSQLRepository(EntityRepository):
         """
         Find an entity by the value of its ID field, if it has one.
         """
+        entity = self.cached(value)
+        if entity is not None:
+            returnValue(entity)
         results = yield self.find_by_field_value(self.id_field, value)
         if results:
+            self.cache(value, results[0])
             returnValue(results[0])
         else:
             returnValue(None)
 
+    @inlineCallbacks
     def find_many_by_id(self, values):
         """
-        Find multiple entities when given multiple IDs.
-        """
-        return self.find_by_field_value(self.id_field, values)
+        Find multiple entities when given multiple IDs, in the order the IDs
+        were given. Entities in the identity map are served from it, and only
+        the rest are queried.
+        """
+        wanted = collections.OrderedDict((self._cache_key(v), v)
+                                         for v in values)
+        found = {}
+        misses = []
+        for key, value in wanted.iteritems():
+            entity = self.cached(value)
+            if entity is None:
+                misses.append(value)
+            else:
+                found[key] = entity
+        if misses:
+            entities = yield self.find_by_field_value(self.id_field, misses)
+            for entity in entities:
+                id_ = getattr(entity, self.id_field)
+                self.cache(id_, entity)
+                found[self._cache_key(id_)] = entity
+        returnValue([found[key] for key in wanted if key in found])
+
+    def _cache_key(self, id_):
+        return getattr(self.model, self.id_field).to_native(id_)
 
     def where(self, field_name, value, op='='):
         """
@@ -706,6 +1197,28 @@ class SchematicsSQLRepository(EntityRepository):
             where = self.col(field_name).op(op)(value)
         return where
 
+    def _where_shape(self, field_name, value, op='='):
+        """
+        The cacheable form of :meth:`where`.
+
+        :return: The shape of the condition (for a cache key), a callable that
+            builds it with bind parameters, and the values of those parameters.
+        :rtype: tuple
+        """
+        field = getattr(self.model, field_name)
+        col = self.col(field_name)
+        if isinstance(value, (list, tuple, set, frozenset)):
+            names = ['value_%d' % i for i in xrange(len(value))]
+            params = dict(zip(names, (field.to_primitive(v) for v in value)))
+            if not names:
+                # An empty IN has no parameters to bind.
+                return (('in', field_name, 0), lambda: col.in_(()), params)
+            return (('in', field_name, len(names)),
+                    lambda: col.in_([bindparam(n) for n in names]), params)
+        params = {'value': field.to_primitive(value)}
+        return ((op, field_name), lambda: col.op(op)(bindparam('value')),
+                params)
+
     @inlineCallbacks
     def _query_for_entities(self, query):
         results = yield self._query(query)
@@ -725,8 +1238,11 @@ class SchematicsSQLRepository(EntityRepository):
         :return: The query results (as deferred value).
         :rtype: twisted.internet.defer.Deferred
         """
-        query = self._select().where(self.where(field_name, value, op))
-        entities = yield self._query_for_entities(query)
+        shape, where, params = self._where_shape(field_name, value, op)
+        results = yield self._query(lambda: self._select().where(where()),
+                                    cache_key=self._shape('find', *shape),
+                                    params=params)
+        entities = yield self._factory(results)
         if collate:
             entities = self.collate(entities)
         returnValue(entities)
@@ -808,18 +1324,37 @@ class ExternalRelationalDatabase(ExternalDatabase):
 
     migrations_path = None
 
+    #: The most compiled statements to keep before the cache is cleared.
+    compiled_cache_size = 1000
+
     _yoyo_uri_re = re.compile(r'^([^:]+):/(?!/)')
 
-    def __init__(self, uri):
+    def __init__(self, uri, options=None):
         """
         Initialize the connection in child implementations.
-        :return:
+
+        :param options: Driver options, such as pool sizes and pragmas. See
+            :func:`db_options`.
+        :type options: dict
         """
         self._uri = urlparse(uri)
+        self._options = options or {}
+        self._compiled_cache = {}
         if self.migrations_path is not None:
             self.run_migrations(self.migrations_path)
         super(ExternalRelationalDatabase, self).__init__(uri)
 
+    def connect(self):
+        self._pool = self.db_driver.connect(self._uri, self._options)
+
+    def pool_stats(self):
+        """
+        :return: Utilization statistics for the connection pool. See
+            :meth:`MeteredConnectionPool.stats`.
+        :rtype: dict
+        """
+        return self._pool.stats()
+
     def run_migrations(self, migrations_path):
         """
         Execute migrations found at the specified path against this database.
@@ -869,12 +1404,18 @@ class ExternalRelationalDatabase(ExternalDatabase):
         """
         Query the database.
 
-        :param query: The query object to run.
+        :param query: The query object to run, or a callable building it (see
+            :meth:`compile`).
         :type query: sqlalchemy.sql.elements.ClauseElement
 
+        :param cache_key: Optional key under which to cache the compiled query.
+        :param params: Values for the query's named bind parameters.
+        :type params: dict
+
         :rtype: twisted.internet.defer.Deferred
         """
-        sql, params = self.compile(query)
+        sql, params = self.compile(query, kw.pop('cache_key', None),
+                                   kw.pop('params', None))
         d = self._pool.runQuery(sql, params, *a, **kw)
         d.addErrback(self._query_errback, sql, params)
         result = yield d
@@ -901,32 +1442,62 @@ class ExternalRelationalDatabase(ExternalDatabase):
         """
         Run an SQL statement whose results we don't care about (ie: writes).
 
-        :param stmt: The SQL statement to run.
+        :param stmt: The SQL statement to run, or a callable building it (see
+            :meth:`compile`).
         :type stmt: sqlalchemy.sql.elements.ClauseElement
 
+        :param cache_key: Optional key under which to cache the compiled query.
+        :param params: Values for the statement's named bind parameters.
+        :type params: dict
+
         :rtype: twisted.internet.defer.Deferred
         """
-        sql, params = self.compile(stmt)
+        sql, params = self.compile(stmt, kw.pop('cache_key', None),
+                                   kw.pop('params', None))
         d = self._pool.runOperation(sql, params, *a, **kw)
         d.addErrback(self._query_errback, sql, params)
         return d
 
-    def compile(self, stmt):
+    def compile(self, stmt, cache_key=None, params=None):
         """
         Compiles an SQLAlchemy statement.
 
-        :param stmt: The statement to compile.
-        :type stmt: sqlalchemy.sql.elements.ClauseElement
+        Statements that are run often can be cached by their shape: build them
+        with named :func:`sqlalchemy.bindparam` placeholders, and pass a key
+        that identifies everything about the statement except the values of
+        those parameters. Later calls with the same key skip compilation, and
+        the statement may be passed as a callable that is only called to build
+        it when the key is not yet cached.
+
+        :param stmt: The statement to compile, or a callable returning it.
+        :type stmt: sqlalchemy.sql.elements.ClauseElement or callable
+
+        :param cache_key: Hashable key of the statement's shape.
+
+        :param params: Values for named bind parameters, overriding any values
+            bound in the statement.
+        :type params: dict
 
         :return: The SQL string and parameters to pass for execution.
         """
-        # noinspection PyArgumentList
-        compiled = stmt.compile(dialect=self.dialect)
-        sql = str(compiled)
+        compiled = None
+        if cache_key is not None:
+            compiled = self._compiled_cache.get(cache_key, None)
+        if compiled is None:
+            if not isinstance(stmt, ClauseElement):
+                stmt = stmt()
+            # noinspection PyArgumentList
+            compiled = stmt.compile(dialect=self.dialect)
+            if cache_key is not None:
+                if len(self._compiled_cache) >= self.compiled_cache_size:
+                    self._compiled_cache.clear()
+                self._compiled_cache[cache_key] = compiled
+        sql = compiled.string
+        values = compiled.construct_params(params)
         if self.dialect.positional:
-            params = tuple(compiled.params[p] for p in compiled.positiontup)
+            params = tuple(values[p] for p in compiled.positiontup)
         else:
-            params = compiled.params
+            params = values
         return sql, params
 
     def insert(self, table, **kw):
@@ -949,6 +1520,7 @@ class UsesExternalDatabase(object):
     """
     _db_class = ExternalRelationalDatabase
     _db_uri = None
+    _db_options = None
     _db = None
     _repositories = {}
 
@@ -957,7 +1529,7 @@ class UsesExternalDatabase(object):
         Create the database connection pool.
         """
         if self._db is None:
-            self._db = self._db_class(self._db_uri)
+            self._db = self._db_class(self._db_uri, self._db_options)
         for attr, cls in self._repositories.iteritems():
             if attr not in self.__dict__ or getattr(self, attr) is None:
                 setattr(self, attr, cls(self._db))
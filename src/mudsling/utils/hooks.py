@@ -79,6 +79,20 @@ def hook_implementations(cls, reset=False):
     return impls
 
 
+def implements_hook(cls, hook_name):
+    """
+    Determine if any class in the MRO of cls implements the named hook.
+
+    :param cls: The class (or instance) to inspect.
+    :param hook_name: The name of the hook.
+    :rtype: bool
+    """
+    for c in ascend_mro(cls):
+        if hook_implementations(c).get(hook_name):
+            return True
+    return False
+
+
 def is_hook_implementation(method, cls=None):
     """
     Determine if the method is a hook implementation, optionally for a specific
@@ -1,6 +1,7 @@
 """
 Sequence utilities.
 """
+from collections import OrderedDict
 from itertools import chain
 import operator
 import types
@@ -117,6 +118,54 @@ class CaselessDict:
             self[k] = v
 
 
+class LRUCache(object):
+    """
+    A dict-like mapping bounded to a maximum number of keys. When full, the
+    least recently used key is discarded to make room for a new one.
+    """
+    __slots__ = ('maxsize', '_data')
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def __getitem__(self, key):
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        if key in data:
+            del data[key]
+        elif len(data) >= self.maxsize:
+            data.popitem(last=False)
+        data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def pop(self, key, *default):
+        return self._data.pop(key, *default)
+
+    def clear(self):
+        self._data.clear()
+
+
 def unique(seq):
     """
     Return a list of unique values in the iterable, preserving their order.
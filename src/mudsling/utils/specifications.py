@@ -1,3 +1,4 @@
+import operator
 from abc import ABCMeta, abstractmethod
 
 
@@ -105,3 +106,63 @@ class NotSpecification(Specification):
     def satisfied_by(self, candidate):
         """:rtype: bool"""
         return not self.spec.satisfied_by(candidate)
+
+
+class AttributeSpecification(Specification):
+    """
+    Satisfied if the candidate's attribute compares to a value as requested.
+
+    Supported operators are the comparisons (=, !=, <, <=, >, >=), 'in' (the
+    attribute value is one of the given values), and 'contains' (the
+    attribute value contains the given value). A candidate lacking the
+    attribute does not satisfy the specification.
+    """
+    operators = {
+        '=': operator.eq,
+        '!=': operator.ne,
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+        'in': lambda a, b: a in b,
+        'contains': operator.contains,
+    }
+
+    def __init__(self, attr, value, op='='):
+        """
+        :param attr: The name of the candidate attribute to compare.
+        :type attr: str
+        :param value: The value to compare against.
+        :param op: The comparison operator.
+        :type op: str
+        """
+        if op not in self.operators:
+            raise ValueError("Unknown operator: %r" % op)
+        self.attr = attr
+        self.value = value
+        self.op = op
+
+    def satisfied_by(self, candidate):
+        """:rtype: bool"""
+        try:
+            value = getattr(candidate, self.attr)
+            return bool(self.operators[self.op](value, self.value))
+        except (AttributeError, TypeError):
+            return False
+
+
+class PredicateSpecification(Specification):
+    """
+    Satisfied if the given callable returns a true value for the candidate.
+    """
+
+    def __init__(self, predicate):
+        """
+        :param predicate: Callable taking the candidate as its only argument.
+        :type predicate: callable
+        """
+        self.predicate = predicate
+
+    def satisfied_by(self, candidate):
+        """:rtype: bool"""
+        return bool(self.predicate(candidate))
@@ -9,6 +9,7 @@ from mudsling.extensibility import GamePlugin
 from mudsling.commands import all_commands
 from mudsling.perms import create_default_roles
 from mudsling.config import config
+from mudsling.utils.db import db_options
 
 from mudslingcore.objects import Thing, Character, Player, Container
 from mudslingcore.rooms import Room, Exit
@@ -16,6 +17,7 @@ from mudslingcore import help
 from mudslingcore import mail
 from mudslingcore import bans
 from mudslingcore import globalvars
+from mudslingcore import channellog
 import mudslingcore.areas as areas
 
 
@@ -45,9 +47,27 @@ class MUDSlingCorePlugin(GamePlugin, areas.AreaProviderPlugin):
         # Load help files to form an in-memory database of the entries.
         help.help_db = help.load_help_files(self.game)
         mail_db_uri = config.getstr('MUDSlingCore Mail', 'mail db uri')
-        mail.mail_db = mail.MailDB(mail_db_uri, self.game)
+        mail.mail_db = mail.MailDB(
+            mail_db_uri, self.game,
+            options=db_options(config.items('MUDSlingCore Mail')))
+        history_db_uri = config.getstr('MUDSlingCore Channels',
+                                       'history db uri')
+        history_options = db_options(config.items('MUDSlingCore Channels'))
+        channellog.history_db = channellog.ChannelHistoryDB(
+            history_db_uri, options=history_options)
+        channellog.writer = channellog.ChannelLogWriter(
+            channellog.history_db.filepath,
+            batch_size=config.getint('MUDSlingCore Channels', 'log batch size'),
+            flush_interval=config.getfloat('MUDSlingCore Channels',
+                                           'log flush interval'),
+            max_queue=config.getint('MUDSlingCore Channels', 'log queue size'),
+            options=history_options)
         create_default_roles(default_roles)
 
+    def server_shutdown(self, reload):
+        if channellog.writer is not None:
+            channellog.writer.stop()
+
     def plugins_loaded(self):
         if 'restserver' in self.game.plugins.plugins:
             import mudslingcore.commands.apikeys as api_commands
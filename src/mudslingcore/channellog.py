@@ -0,0 +1,230 @@
+"""
+Channel history storage.
+
+All channel logs live in one history database (:class:`ChannelHistoryDB`),
+indexed by channel and time and, where SQLite supports it, searchable by full
+text.
+Channels hand their log rows to the shared :class:`ChannelLogWriter`, which
+writes them from its own thread in batched transactions so that disk latency
+never stalls the game.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import Queue
+from collections import namedtuple
+
+from mudsling.utils.db import ExternalRelationalDatabase, SQLiteDriver
+from mudsling.utils.db import sqlite_table_exists
+from mudsling.utils.db import fts_match_query, like_pattern
+
+from mudslingcore.misc import migrations_path
+
+
+HistoryEntry = namedtuple('HistoryEntry',
+                          'id channel_id timestamp source text')
+
+
+class ChannelHistoryDB(ExternalRelationalDatabase):
+    """
+    Wrapper around the channel history SQLite database.
+
+    Queries return entries newest first and are paged by entry ID: pass the ID
+    of the last entry of one page as ``before_id`` to get the next page.
+
+    :ivar fts: Whether the full-text index is available for searches.
+    :type fts: bool
+    """
+    migrations_path = migrations_path('channel_history')
+    fts = False
+
+    def _after_migration(self):
+        self.fts = sqlite_table_exists(self._uri.path, 'history_fts')
+
+    @property
+    def filepath(self):
+        return self._uri.path
+
+    def query(self, channel_id, since=None, until=None, match=None,
+              before_id=None, limit=50):
+        """
+        Find history entries for a channel.
+
+        :param channel_id: The object ID of the channel.
+        :type channel_id: int
+        :param since: Only entries at or after this UNIX timestamp.
+        :type since: int
+        :param until: Only entries before this UNIX timestamp.
+        :type until: int
+        :param match: Only entries containing all these words.
+        :type match: str
+        :param before_id: Only entries older than the entry with this ID.
+        :type before_id: int
+        :param limit: The maximum number of entries to return.
+        :type limit: int
+
+        :return: Deferred list of HistoryEntry, newest first.
+        :rtype: twisted.internet.defer.Deferred
+        """
+        return self.interaction(self._query, channel_id, since, until, match,
+                                before_id, limit)
+
+    def recent(self, channel_id, count=50, before_id=None):
+        """:rtype: twisted.internet.defer.Deferred"""
+        return self.query(channel_id, before_id=before_id, limit=count)
+
+    def since(self, channel_id, timestamp, limit=None, before_id=None):
+        """:rtype: twisted.internet.defer.Deferred"""
+        return self.query(channel_id, since=timestamp, before_id=before_id,
+                          limit=limit)
+
+    def search(self, channel_id, text, limit=50, before_id=None):
+        """:rtype: twisted.internet.defer.Deferred"""
+        return self.query(channel_id, match=text, before_id=before_id,
+                          limit=limit)
+
+    def _query(self, txn, channel_id, since, until, match, before_id, limit):
+        joins = ''
+        conditions = ['h.channel_id = ?']
+        params = [channel_id]
+        if since is not None:
+            conditions.append('h.timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('h.timestamp < ?')
+            params.append(until)
+        if before_id is not None:
+            conditions.append('h.id < ?')
+            params.append(before_id)
+        words = match.split() if match else ()
+        if words and self.fts:
+            joins = ' JOIN history_fts ON history_fts.rowid = h.id'
+            conditions.append('history_fts MATCH ?')
+            params.append(fts_match_query(match))
+        else:
+            for word in words:
+                conditions.append("h.text LIKE ? ESCAPE '\\'")
+                params.append(like_pattern(word))
+        sql = ('SELECT h.id, h.channel_id, h.timestamp, h.source, h.text'
+               ' FROM history h%s WHERE %s ORDER BY h.id DESC'
+               % (joins, ' AND '.join(conditions)))
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        txn.execute(sql, params)
+        return [HistoryEntry(*row) for row in txn.fetchall()]
+
+
+class ChannelLogWriter(object):
+    """
+    Writes channel log rows to the history database from a dedicated thread.
+
+    Rows are queued by :meth:`write` and committed in groups, once
+    ``batch_size`` rows are pending or ``flush_interval`` seconds have passed.
+    The queue holds at most ``max_queue`` writes. Beyond that, rows are
+    dropped and counted rather than letting memory grow without bound.
+    ``options`` may override the SQLite pragmas set on the writer's
+    connection, as for :class:`ChannelHistoryDB`.
+
+    :ivar dropped: The number of rows dropped because the queue was full.
+    :type dropped: int
+    """
+    _stop = object()
+
+    def __init__(self, filepath, batch_size=200, flush_interval=0.5,
+                 max_queue=10000, options=None):
+        self.filepath = filepath
+        self.pragmas = SQLiteDriver.connection_pragmas(options or {})
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self._thread = threading.Thread(target=self._run,
+                                                name='ChannelLogWriter')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def stop(self, timeout=10):
+        """
+        Write any queued rows, then stop the writer thread.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self.queue.put(self._stop)
+            thread.join(timeout)
+
+    def write(self, rows):
+        """
+        Queue rows to be written to the history table.
+
+        :param rows: (channel_id, timestamp, source, text) tuples.
+        :type rows: list of tuple
+        """
+        if not self.running:
+            self.start()
+        try:
+            self.queue.put_nowait(rows)
+        except Queue.Full:
+            if not self.dropped:
+                logging.warning('Channel log queue is full, dropping rows.')
+            self.dropped += len(rows)
+
+    def _run(self):
+        conn = None
+        pending = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = (None if deadline is None
+                       else max(0, deadline - time.time()))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Queue.Empty:
+                item = None
+            if item is self._stop:
+                stopping = True
+            elif item is not None:
+                pending.extend(item)
+                if deadline is None:
+                    deadline = time.time() + self.flush_interval
+            if pending and (stopping or len(pending) >= self.batch_size
+                            or time.time() >= deadline):
+                conn = self._flush(conn, pending)
+                pending = []
+                deadline = None
+        if conn is not None:
+            conn.close()
+
+    def _flush(self, conn, rows):
+        try:
+            if conn is None:
+                conn = sqlite3.connect(self.filepath)
+                SQLiteDriver.apply_pragmas(conn, self.pragmas)
+            with conn:
+                conn.executemany('INSERT INTO history'
+                                 ' (channel_id, timestamp, source, text)'
+                                 ' VALUES (?, ?, ?, ?)', rows)
+        except sqlite3.Error:
+            logging.exception('Error writing %d rows to channel history'
+                              % len(rows))
+        return conn
+
+
+# Configured by MUDSlingCorePlugin.
+#: :type: ChannelHistoryDB
+history_db = None
+#: :type: ChannelLogWriter
+writer = None
@@ -3,23 +3,20 @@ MUDSlingCore channel system.
 """
 import logging
 import re
-import sqlite3
-import os
 
 from mudsling.objects import NamedObject, BaseObject
 from mudsling import locks
 from mudsling.commands import Command, CommandSet
-from mudsling.parsers import BoolStaticParser, MatchDescendants
+from mudsling.parsers import BoolStaticParser, IntStaticParser
+from mudsling.parsers import MatchDescendants
 from mudsling import errors
 
 from mudsling import utils
 import mudsling.utils.string
-import mudsling.utils.file as file_utils
-import mudsling.utils.db as db_utils
 import mudsling.utils.time as time_utils
 from mudsling.utils.hooks import hook
 
-import mudslingcore
+from mudslingcore import channellog
 from mudslingcore.ui import ClassicUI
 
 ui = ClassicUI()
@@ -499,6 +496,44 @@ class ChannelLogCmd(Command):
             this.broadcast(msg, who=actor)
 
 
+class ChannelHistoryCmd(Command):
+    """
+    <alias> /history [<count>]
+    <alias> /history [<count>] {with|matching} <text>
+
+    Show recent logged messages on the channel, optionally only those that
+    contain all the given words.
+    """
+    aliases = ('history', 'hist')
+    syntax = (
+        "[<count>] {with|matching} <text>",
+        "[<count>]"
+    )
+    arg_parsers = {
+        'count': IntStaticParser,
+    }
+    lock = 'operator()'
+
+    def run(self, this, actor, args):
+        """
+        :type this: mudslingcore.channels.Channel
+        :type actor: mudslingcore.channels.ChannelUser
+        :type args: dict
+        """
+        count = args.get('count', None) or 20
+        d = this.history(match=args.get('text', None), limit=count)
+        d.addCallback(self._show_history, this, actor)
+
+    def _show_history(self, entries, this, actor):
+        if not entries:
+            this.tell(actor, '{yNo logged messages found.')
+            return
+        for entry in reversed(entries):
+            this.tell(actor, '{c',
+                      time_utils.format_timestamp(entry.timestamp, 'short'),
+                      '{n ', entry.text)
+
+
 class Channel(NamedObject):
     """
     Channel object stores the state/config for a channel in the game, the list
@@ -523,9 +558,6 @@ class Channel(NamedObject):
     topic = ''
     _log_enabled = False
 
-    _logfile = None
-    _transient_vars = ['_logfile']
-
     commands = CommandSet([
         ChannelWhoCmd,
         ChannelAllowCmd,
@@ -540,6 +572,7 @@ class Channel(NamedObject):
         ChannelInviteCmd,
         ChannelUninviteCmd,
         ChannelLogCmd,
+        ChannelHistoryCmd,
     ])
 
     def __init__(self, **kwargs):
@@ -554,8 +587,31 @@ class Channel(NamedObject):
 
     @property
     def participants(self):
-        return [p for p in self._participants
-                if self.db.is_valid(p, cls=ChannelUser) and p.connected]
+        return list(self._connected_participants())
+
+    def _connected_participants(self):
+        """
+        The connected players among those joined to the channel. The set is
+        built on first use, then kept current as participants join, leave,
+        connect, disconnect, or are deleted.
+
+        :rtype: set
+        """
+        connected = self.__dict__.get('_v_connected', None)
+        if connected is None:
+            connected = set(p for p in self._participants
+                            if self.db.is_valid(p, cls=ChannelUser)
+                            and p.connected)
+            self._v_connected = connected
+        return connected
+
+    def participant_connected(self, who):
+        who = who.ref()
+        if who in self._participants:
+            self._connected_participants().add(who)
+
+    def participant_disconnected(self, who):
+        self._connected_participants().discard(who.ref())
 
     @hook('before_deleted')
     def __before_deleted(self):
@@ -581,7 +637,8 @@ class Channel(NamedObject):
 
     def broadcast(self, msg, who=None):
         msg = self._prepare_message(msg)
-        for p in self.participants:
+        # Copy, since a failed message could disconnect its recipient.
+        for p in list(self._connected_participants()):
             try:
                 p.msg(msg)
             except Exception:
@@ -601,7 +658,7 @@ class Channel(NamedObject):
 
     def speakable_by(self, who):
         who = who.ref()
-        if who in self.participants:
+        if who in self._connected_participants():
             if self.voice is None or who in self.voice:
                 return True
         if who in self.operators:
@@ -610,11 +667,14 @@ class Channel(NamedObject):
 
     def joined_by(self, who):
         self._participants.add(who.ref())
+        if who.connected:
+            self.participant_connected(who)
         self.broadcast(who.channel_name + ' has joined this channel.')
 
     def left_by(self, who):
         self.broadcast(who.channel_name + ' has left this channel.')
         self._participants.remove(who.ref())
+        self.participant_disconnected(who)
 
     def process_input(self, input, who):
         if input.startswith('/'):
@@ -661,43 +721,9 @@ class Channel(NamedObject):
     @log_enabled.setter
     def log_enabled(self, val):
         self._log_enabled = val
-        if val and self._logfile is None:
-            self._init_logfile()
-        elif not val and self._logfile:
-            self._logfile.commit()
-            self._logfile.close()
-            self._logfile = None
-
-    @property
-    def log_filename(self):
-        return file_utils.sanitize_filename('%s-%d.sqlite' % (self.name,
-                                                              self.obj_id))
-
-    @property
-    def log_filepath(self):
-        return self.game.game_file_path(os.path.join('channel_logs',
-                                                     self.log_filename))
-
-    def _init_logfile(self):
-        if self._logfile is None:
-            filepath = self.log_filepath
-            if not os.path.exists(filepath):
-                try:
-                    self.game.makedirs('channel_logs')
-                except OSError:
-                    # It probably already exists...
-                    pass
-                conn = sqlite3.connect(filepath)
-                conn.close()
-            # Apply any pending migrations.
-            module_root = os.path.dirname(mudslingcore.__file__)
-            migrations = os.path.join(module_root, 'schemas', 'channel_log')
-            db_utils.migrate('sqlite:///%s' % filepath, migrations)
-            self._logfile = sqlite3.connect(filepath)
 
     def log(self, source, text):
-        if self._log_enabled:
-            self._init_logfile()
+        if self._log_enabled and channellog.writer is not None:
             if hasattr(source, 'obj_id'):
                 if hasattr(source, 'name'):
                     source = '%s (#%d)' % (source.name, source.obj_id)
@@ -705,14 +731,21 @@ class Channel(NamedObject):
                     source = '#%d' % source.obj_id
             else:
                 source = str(source)
-            lines = [''.join(l.split(self.prefix, 1))
-                     for l in text.splitlines()]
-            logfile = self._logfile
-            for line in lines:
-                logfile.execute('INSERT INTO log (timestamp, source, text)'
-                                'VALUES (?, ?, ?)',
-                                (time_utils.unixtime(), source, line))
-            logfile.commit()
+            timestamp = time_utils.unixtime()
+            rows = [(self.obj_id, timestamp, source,
+                     ''.join(l.split(self.prefix, 1)))
+                    for l in text.splitlines()]
+            channellog.writer.write(rows)
+
+    def history(self, **kwargs):
+        """
+        Query the logged history of this channel.
+
+        See :meth:`mudslingcore.channellog.ChannelHistoryDB.query`.
+
+        :rtype: twisted.internet.defer.Deferred
+        """
+        return channellog.history_db.query(self.obj_id, **kwargs)
 
 
 class ChannelsCmd(Command):
@@ -916,6 +949,29 @@ class ChannelUser(BaseObject):
         super(ChannelUser, self).__init__(**kwargs)
         self.channels = {}
 
+    def _joined_channels(self):
+        me = self.ref()
+        for channel in (getattr(self, 'channels', None) or {}).itervalues():
+            if (self.db.is_valid(channel, cls=Channel)
+                    and me in channel._participants):
+                yield channel
+
+    @hook('after_session_attached')
+    def __after_session_attached(self, session):
+        for channel in self._joined_channels():
+            channel.participant_connected(self)
+
+    @hook('after_session_detached')
+    def __after_session_detached(self, session):
+        for channel in self._joined_channels():
+            channel.participant_disconnected(self)
+
+    @hook('before_deleted')
+    def __before_deleted(self):
+        for channel in list(self._joined_channels()):
+            channel._participants.discard(self.ref())
+            channel.participant_disconnected(self)
+
     @property
     def channel_name(self):
         return self.name
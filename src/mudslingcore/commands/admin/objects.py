@@ -21,7 +21,7 @@ from mudslingcore import misc
 from mudslingcore.objsettings import ConfigurableObject, lock_can_configure
 from mudslingcore.objsettings import SettingEditorSession
 from mudslingcore.editor import EditorError
-from mudslingcore.rooms import RoomGroup
+from mudslingcore.rooms import Room, RoomGroup
 from mudslingcore.inspectable import InspectableObject
 
 from mudslingcore.commands.admin import ui
@@ -686,7 +686,15 @@ class FindPlaceCmd(mudsling.commands.Command):
         :type search: str
         :type group: mudslingcore.rooms.RoomGroup
         """
-        matches = actor._match(search, list(group.all_rooms))
+        rooms = group.all_rooms
+        if not search.startswith('#') and actor.has_standard_names_for():
+            # Narrow by name first, keeping the rooms in hierarchy order. Add
+            # the rooms known by special names, as match_obj_of_type does.
+            candidates = set(self.game.db.name_candidates(search, Room))
+            candidates.update(o for o in actor.primary_context()
+                              if o.isa(Room))
+            rooms = [r for r in rooms if r in candidates]
+        matches = actor._match(search, rooms)
         if not matches:
             p = self.args['optset1'].lower()
             actor.tell('{yNo places found matching "{m', search, '{y" ', p,
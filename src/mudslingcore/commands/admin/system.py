@@ -8,6 +8,8 @@ from mudsling.objects import Object
 from mudsling.utils import string
 from mudsling.storage import ObjRef
 
+from . import ui  # Use the admin package ui.
+
 
 class ShutdownCmd(Command):
     """
@@ -57,6 +59,46 @@ class ProfileCommandCmd(Command):
         actor.process_input(subcmd)
 
 
+class DatabaseStatsCmd(Command):
+    """
+    @db-stats
+
+    Show connection pool utilization for the external databases.
+    """
+    aliases = ('@db-stats', '@dbstats')
+    lock = 'perm(eval code)'
+
+    def run(self, this, actor, args):
+        from mudslingcore import mail, channellog
+        databases = (('Mail', mail.mail_db),
+                     ('Channel History', channellog.history_db))
+        rows = []
+        for name, db in databases:
+            if db is not None:
+                stats = db.pool_stats()
+                stats['name'] = name
+                stats['size'] = '%d-%d' % (stats['min'], stats['max'])
+                rows.append(stats)
+        ms = lambda t: '%.1f ms' % (t * 1000)
+        table = ui.Table([
+            ui.Column('Database', data_key='name', align='l'),
+            ui.Column('Pool', data_key='size', align='r'),
+            ui.Column('Conns', data_key='connections', align='r'),
+            ui.Column('Busy', data_key='busy', align='r'),
+            ui.Column('Idle', data_key='idle', align='r'),
+            ui.Column('Queued', data_key='queued', align='r'),
+            ui.Column('Calls', data_key='calls', align='r'),
+            ui.Column('Avg Wait', data_key='avg_wait', align='r',
+                      cell_formatter=ms),
+            ui.Column('Max Wait', data_key='max_wait', align='r',
+                      cell_formatter=ms),
+            ui.Column('Avg Run', data_key='avg_run', align='r',
+                      cell_formatter=ms),
+        ])
+        table.add_rows(*rows)
+        actor.msg(ui.report('Database Pools', table))
+
+
 class EvalCmd(Command):
     """
     @eval <python code>
@@ -77,19 +77,23 @@ class MailSubCommand(Command):
         actor.tell('{gYou are now composing ', session.description, '.')
         return session
 
-    def list_messages(self, messages, title=None, footer=''):
+    def _message_table(self, **settings):
         ui = self.actor.get_ui()
         name = lambda m, na, ia: self._whostr(getattr(m, na), getattr(m, ia))
         mid = lambda m: str(m.mailbox_index) + (' ' if m.read else '{y*{n')
         c = ui.Column
-        t = ui.Table([
+        return ui.Table([
             c('ID', align='r', cell_formatter=mid),
             c('Date', align='l', data_key='timestamp',
               cell_formatter=format_timestamp, formatter_args=('short',)),
             c('From', align='l', cell_formatter=name,
               formatter_args=('from_name', 'from_id')),
             c('Subject', align='l', data_key='subject')
-        ])
+        ], **settings)
+
+    def list_messages(self, messages, title=None, footer=''):
+        ui = self.actor.get_ui()
+        t = self._message_table()
         if messages:
             t.add_rows(*sorted(messages.itervalues(),
                                key=lambda m: m.mailbox_index))
@@ -99,6 +103,49 @@ class MailSubCommand(Command):
             title = '@mail: %d messages' % len(messages)
         self.actor.msg(ui.report(title, t, footer))
 
+    def stream_messages(self, seq, title=None):
+        """
+        List the messages in a sequence, showing each page of headers as soon
+        as it is loaded instead of waiting for the whole listing.
+
+        :param title: The title, which may use {count} and {messages}.
+        :type title: str
+
+        :rtype: twisted.internet.defer.Deferred
+        """
+        seq = self.mailbox.parse_sequence(seq) if isinstance(seq, str) else seq
+        d = self.mailbox.count_messages(seq)
+        d.addCallback(self._stream_messages, seq,
+                      title or '@mail: {count} {messages}')
+        return d
+
+    def _stream_messages(self, count, seq, title):
+        ui = self.actor.get_ui()
+        title = title.format(count=count,
+                             messages=plural_noun('message', count))
+        if not count:
+            t = self._message_table()
+            t.add_row('(no messages found matching query)')
+            self.actor.msg(ui.report(title, t))
+            return
+        widths = []
+
+        def show_page(page):
+            if widths:
+                # Later pages reuse the first page's layout, without header.
+                t = self._message_table(widths=widths, show_header=False)
+                t.add_rows(*page)
+                self.actor.msg(ui.body(str(t)))
+            else:
+                t = self._message_table()
+                t.add_rows(*page)
+                widths.extend(t._calc_widths())
+                self.actor.msg('\n'.join([ui.h1(title), ui.body(str(t))]))
+
+        d = self.mailbox.stream_messages(seq, show_page)
+        d.addCallback(lambda n: self.actor.msg(ui.footer()))
+        return d
+
     def _show_error(self, err):
         err.trap(Exception)
         if err.check(errors.MatchError, MailError, ValueError):
@@ -173,23 +220,18 @@ class MailListCmd(MailSubCommand):
         :type actor: MailRecipient
         :type seq: dict
         """
+        title = '@mail: {count} {messages}'
         if not seq:
             seq = '1-$ last:15'
+        else:
+            seqstr = self.args['seq'].replace('{', '{{').replace('}', '}}')
+            title += ' (%s)' % seqstr
         try:
-            d = self.mailbox.get_messages_from_sequence(seq)
+            d = self.stream_messages(seq, title)
         except MailError as e:
             raise self._err(e.message)
-        d.addCallback(self._show_messages,
-                      self.args['seq'] if seq is not None else None)
         d.addErrback(self._show_error)
 
-    def _show_messages(self, messages, seqstr):
-        n = len(messages)
-        title = '@mail: %d %s' % (n, plural_noun('message', n))
-        if seqstr is not None:
-            title += ' (%s)' % seqstr
-        self.list_messages(messages, title=title)
-
 
 class MailNewCmd(MailSubCommand):
     """
@@ -200,8 +242,8 @@ class MailNewCmd(MailSubCommand):
     aliases = ('new',)
 
     def run(self, this, actor):
-        d = self.mailbox.get_messages_from_sequence('unread')
-        d.addCallback(self.list_messages, title='New Messages')
+        d = self.stream_messages('unread', 'New Messages')
+        d.addErrback(self._show_error)
 
 
 class MailSendCmd(MailSubCommand):
@@ -469,15 +511,32 @@ class MailRecipient(BaseObject, UsesUI):
         """:rtype: twisted.internet.defer.Deferred"""
         return self.mailbox.get_next_unread_message()
 
-    def notify_new_mail(self, message):
-        whostr = message.from_name
-        if self.has_perm('see object numbers'):
-            whostr += ' (#%d)' % message.from_id
+    def notify_new_mail(self, *messages):
+        """
+        Tell the recipient about newly arrived messages, in one line.
+
+        :param messages: The new messages.
+        :type messages: list of mudslingcore.mail.storage.Message
+        """
+        player = self.player
+        if player is None or not player.connected:
+            return  # Nobody to tell, so skip formatting the notice.
+        senders = []
+        for message in messages:
+            whostr = message.from_name
+            if self.has_perm('see object numbers'):
+                whostr += ' (#%d)' % message.from_id
+            if whostr not in senders:
+                senders.append(whostr)
+        indexes = [message.recipient_indexes[self.obj_id]
+                   for message in messages
+                   if self.obj_id in message.recipient_indexes]
         m = '{gYou have new mail '
-        index = message.recipient_indexes.get(self.obj_id, None)
-        if index is not None:
-            m += '({y%d{g) ' % index
-        m += 'from {c%s{g.' % whostr
+        if len(indexes) == 1:
+            m += '({y%d{g) ' % indexes[0]
+        elif indexes:
+            m += '({y%d{g-{y%d{g) ' % (min(indexes), max(indexes))
+        m += 'from %s.' % and_list(['{c%s{g' % s for s in senders])
         self.msg(m)
 
     def notify_sent(self, message):
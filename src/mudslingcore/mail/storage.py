@@ -1,10 +1,12 @@
 import re
+import inspect
 from collections import OrderedDict
 
 from twisted.internet.defer import inlineCallbacks, returnValue
 
 from mudsling.storage import ObjRef
-from mudsling.utils.db import ExternalRelationalDatabase
+from mudsling.utils.db import ExternalRelationalDatabase, sqlite_table_exists
+from mudsling.utils.db import fts_match_query, like_pattern
 from mudsling.utils.time import parse_datetime, unixtime
 from mudsling.utils.string import split_quoted_words
 from mudsling.objects import NamedObject
@@ -23,13 +25,17 @@ class MailDB(ExternalRelationalDatabase):
     #: :type: mudsling.core.MUDSling
     game = None
 
-    def __init__(self, uri, game):
+    #: Whether the full-text index is available for subject/body filters.
+    fts = False
+
+    def __init__(self, uri, game, options=None):
         """
         :type uri: str
         :type game: mudsling.core.MUDSling
+        :type options: dict
         """
         self.game = game
-        super(MailDB, self).__init__(uri)
+        super(MailDB, self).__init__(uri, options)
 
         self.set_re = re.compile(
             r'(?P<explicit>(?:(?P<start>\d+)(?:(?:\.\.|-)(?P<end>\d+|\$))?))'
@@ -37,6 +43,9 @@ class MailDB(ExternalRelationalDatabase):
         self.filter_re = re.compile(r'(?P<filter>%s)(?::(?P<param>.*))?'
                                     % ('|'.join(self.sequence_filters.keys())))
 
+    def _after_migration(self):
+        self.fts = sqlite_table_exists(self._uri.path, 'messages_fts')
+
     @inlineCallbacks
     def get_message(self, message_id):
         conditions = (('m.message_id = ?', message_id),)
@@ -99,13 +108,7 @@ class MailDB(ExternalRelationalDatabase):
                FROM messages m
          INNER JOIN message_recipient mr ON (mr.message_id = m.message_id)
         """
-        params = []
-        for join in joins:
-            query += '\n ' + join[0]
-            params.extend(join[1:])
-        for cond in conditions:
-            query += '\n                   %s' % cond[0]
-            params.extend(cond[1:])
+        query, params = self._add_clauses(query, conditions, joins)
         if order is not None:
             query += ' ORDER BY %s' % order
         if limit is not None:
@@ -161,6 +164,150 @@ class MailDB(ExternalRelationalDatabase):
                 messages[message.message_id] = message
         returnValue(messages)
 
+    @staticmethod
+    def _add_clauses(query, conditions, joins=()):
+        params = []
+        for join in joins:
+            query += '\n ' + join[0]
+            params.extend(join[1:])
+        for cond in conditions:
+            query += '\n                   %s' % cond[0]
+            params.extend(cond[1:])
+        return query, params
+
+    def _header_query(self, txn, conditions, joins=(), after_index=None,
+                      limit=None):
+        """
+        Fetch the headers of messages in a mailbox, in mailbox index order.
+        Bodies and the other recipients are not loaded.
+
+        The conditions and joins are as for :meth:`_message_query`, and must
+        join the mailbox as ``mailbox`` (see :meth:`sequence_query_params`).
+
+        :param after_index: Only messages after this mailbox index.
+        :type after_index: int
+
+        :param limit: The maximum number of results.
+        :type limit: int
+
+        :return: The result rows.
+        :rtype: list of sqlite3.Row
+        """
+        query = """
+             SELECT m.message_id,
+                    m.timestamp,
+                    m.from_id,
+                    m.from_name,
+                    m.subject,
+                    mailbox.recipient_id,
+                    mailbox.mailbox_index,
+                    mailbox.read
+               FROM messages m
+        """
+        query, params = self._add_clauses(query, conditions, joins)
+        if after_index is not None:
+            query += ' AND mailbox.mailbox_index > ?'
+            params.append(after_index)
+        query += ' ORDER BY mailbox.mailbox_index ASC'
+        if limit is not None:
+            query += ' LIMIT %d' % limit
+        txn.execute(query, params)
+        return txn.fetchall()
+
+    def _sequence_start(self, txn, conditions, joins=(), count=1):
+        """
+        Find the mailbox index before the last ``count`` messages matching the
+        conditions, so that they can be fetched in ascending order.
+
+        :rtype: int or None
+        """
+        query, params = self._add_clauses(
+            'SELECT mailbox.mailbox_index FROM messages m', conditions, joins)
+        query += ' ORDER BY mailbox.mailbox_index DESC LIMIT 1 OFFSET ?'
+        params.append(count)
+        txn.execute(query, params)
+        row = txn.fetchone()
+        return None if row is None else row[0]
+
+    def _sequence_count(self, txn, conditions, joins=(), limit=None):
+        query, params = self._add_clauses('SELECT 1 FROM messages m',
+                                          conditions, joins)
+        if limit is not None:
+            query += ' LIMIT %d' % limit
+        txn.execute('SELECT COUNT(*) FROM (%s)' % query, params)
+        return txn.fetchone()[0]
+
+    def count_sequence(self, recipient_id, set, filters):
+        """
+        Count the messages in a sequence, up to its limit.
+
+        :return: The number of messages (as deferred value).
+        :rtype: twisted.internet.defer.Deferred
+        """
+        query = self.sequence_query_params(recipient_id, set, filters)
+        return self._pool.runInteraction(self._sequence_count,
+                                         query['conditions'], query['joins'],
+                                         limit=query['limit'])
+
+    @inlineCallbacks
+    def header_pages(self, recipient_id, set, filters, callback,
+                     page_size=50):
+        """
+        Stream the headers of the messages in a sequence, a page at a time.
+
+        Pages are fetched by mailbox index (keyset pagination), so each page
+        costs the same no matter how large the mailbox is. Only the headers
+        are loaded: use :meth:`Message.load_body` and
+        :meth:`Message.load_recipients` when the rest is needed.
+
+        :param recipient_id: The recipient whose mailbox to list.
+        :type recipient_id: int
+
+        :param set: The message set, as returned by :meth:`parse_set`.
+        :type set: tuple
+
+        :param filters: The filters, as returned by :meth:`parse_filter`.
+        :type filters: list
+
+        :param callback: Called with each page (a list of :class:`Message`) as
+            it arrives, in mailbox index order.
+        :type callback: callable
+
+        :param page_size: The maximum number of messages per page.
+        :type page_size: int
+
+        :return: The number of messages listed (as deferred value).
+        :rtype: twisted.internet.defer.Deferred
+        """
+        query = self.sequence_query_params(recipient_id, set, filters)
+        conditions = query['conditions']
+        joins = query['joins']
+        remaining = query['limit']
+        after_index = None
+        if query['order'].endswith('DESC'):
+            # The last N messages: find where they start, then page forward.
+            after_index = yield self._pool.runInteraction(
+                self._sequence_start, conditions, joins, remaining)
+        total = 0
+        while remaining is None or remaining > 0:
+            limit = page_size if remaining is None else min(page_size,
+                                                             remaining)
+            rows = yield self._pool.runInteraction(
+                self._header_query, conditions, joins,
+                after_index=after_index, limit=limit)
+            if not rows:
+                break
+            page = [Message.from_row(row, self, mailbox_id=recipient_id)
+                    for row in rows]
+            callback(page)
+            total += len(page)
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < limit:
+                break
+            after_index = page[-1].mailbox_index
+        returnValue(total)
+
     def max_mailbox_index(self, txn, recipient_id):
         r = txn.execute("""
                 SELECT MAX(mailbox_index) max_index
@@ -342,13 +489,24 @@ class MailDB(ExternalRelationalDatabase):
                                  WHERE mr_tostr.recipient_name LIKE ?)
             """, search))
 
+    def _filter_text(self, query, field, text):
+        if self.fts and text.split():
+            # Prefix matches keep the feel of the substring search without FTS.
+            search = '%s : (%s)' % (field, fts_match_query(text, prefix=True))
+            query['conditions'].append(("""
+                AND m.message_id IN (SELECT rowid
+                                     FROM messages_fts
+                                     WHERE messages_fts MATCH ?)
+                """, search))
+        else:
+            query['conditions'].append(
+                ("AND m.%s LIKE ? ESCAPE '\\'" % field, like_pattern(text)))
+
     def _filter_subject(self, recipient_id, query, text):
-        search = '%%%s%%' % text
-        query['conditions'].append(('AND m.subject LIKE ?', search))
+        self._filter_text(query, 'subject', text)
 
     def _filter_body(self, recipient_id, query, text):
-        search = '%%%s%%' % text
-        query['conditions'].append(('AND m.body LIKE ?', search))
+        self._filter_text(query, 'body', text)
 
     def _filter_first(self, recipient_id, query, num):
         query['limit'] = int(num)
@@ -369,7 +527,6 @@ class MailDB(ExternalRelationalDatabase):
                for r in rows}
         returnValue(rcp)
 
-    @inlineCallbacks
     def save_message(self, message):
         """
         Save a message to the database.
@@ -379,12 +536,36 @@ class MailDB(ExternalRelationalDatabase):
 
         :rtype: twisted.internet.defer.Deferred
         """
-        def _insert_message(txn, message):
-            sql = """
-                INSERT INTO messages (
-                    timestamp, from_id, from_name, subject, body)
-                VALUES (:timestamp, :from_id, :from_name, :subject, :body)
-            """
+        d = self.save_messages((message,))
+        d.addCallback(lambda messages: messages[0])
+        return d
+
+    def save_messages(self, messages):
+        """
+        Save several messages to the database in a single transaction.
+
+        Mailbox indexes for all the recipients are allocated together, and
+        the recipient rows are inserted in one batch, so mass mailings cost
+        a handful of statements instead of several per recipient.
+
+        :param messages: The messages to save.
+        :type messages: list of Message
+
+        :return: The saved messages, with their recipients' mailbox indexes
+            (as deferred value).
+        :rtype: twisted.internet.defer.Deferred
+        """
+        return self._pool.runInteraction(self._save_messages, list(messages))
+
+    def _save_messages(self, txn, messages):
+        sql = """
+            INSERT INTO messages (
+                timestamp, from_id, from_name, subject, body)
+            VALUES (:timestamp, :from_id, :from_name, :subject, :body)
+        """
+        # Writing the messages first takes the database write lock, so no
+        # other connection can allocate mailbox indexes until we commit.
+        for message in messages:
             txn.execute(sql, {
                 'timestamp': message.timestamp,
                 'from_id': message.from_id,
@@ -392,31 +573,46 @@ class MailDB(ExternalRelationalDatabase):
                 'subject': message.subject,
                 'body': message.body
             })
-            return txn.lastrowid
-
-        def _insert_recipients(txn, message):
-            index_sql = """
-                SELECT IFNULL(MAX(mailbox_index), 0) + 1
-                FROM message_recipient mr
-                WHERE mr.recipient_id = :recipient_id"""
-            sql = """
-                INSERT INTO message_recipient (
-                    message_id, recipient_id, recipient_name, mailbox_index
-                ) VALUES (
-                    :message_id, :recipient_id, :recipient_name, (%s)
-                )
-            """ % index_sql
-            params = ({'message_id': message.message_id,
-                       'recipient_id': k,
-                       'recipient_name': v}
-                      for k, v in message.recipients.iteritems())
-            txn.executemany(sql, params)
-
-        message.message_id = yield self._pool.runInteraction(_insert_message,
-                                                             message)
-        yield self._pool.runInteraction(_insert_recipients, message)
-        yield message.load_recipients()
-        returnValue(message)
+            message.message_id = txn.lastrowid
+        recipient_ids = set()
+        for message in messages:
+            recipient_ids.update(message.recipients.iterkeys())
+        next_index = self._next_mailbox_indexes(txn, recipient_ids)
+        rows = []
+        for message in messages:
+            for rid, rname in message.recipients.iteritems():
+                index = next_index[rid]
+                next_index[rid] += 1
+                message.recipient_indexes[rid] = index
+                rows.append((message.message_id, rid, rname, index))
+        txn.executemany("""
+            INSERT INTO message_recipient (
+                message_id, recipient_id, recipient_name, mailbox_index
+            ) VALUES (?, ?, ?, ?)
+        """, rows)
+        return messages
+
+    def _next_mailbox_indexes(self, txn, recipient_ids, chunk_size=500):
+        """
+        Find the next free mailbox index of each recipient.
+
+        :rtype: dict of (int, int)
+        """
+        next_index = dict.fromkeys(recipient_ids, 1)
+        recipient_ids = list(recipient_ids)
+        # Stay below SQLite's limit on the number of bound parameters.
+        for i in xrange(0, len(recipient_ids), chunk_size):
+            chunk = recipient_ids[i:i + chunk_size]
+            txn.execute("""
+                SELECT recipient_id, MAX(mailbox_index) + 1
+                FROM message_recipient
+                WHERE recipient_id IN (%s)
+                GROUP BY recipient_id
+            """ % ', '.join('?' * len(chunk)), chunk)
+            for rid, index in txn.fetchall():
+                if index is not None:
+                    next_index[rid] = index
+        return next_index
 
 
 class MailBox(object):
@@ -470,17 +666,34 @@ class MailBox(object):
     @inlineCallbacks
     def get_messages_from_sequence(self, seq):
         """:rtype: twisted.internet.defer.Deferred"""
-        if isinstance(seq, str):
-            sequence = self.parse_sequence(seq)
-        elif seq is None:
-            sequence = self.parse_sequence('')
-        else:
-            sequence = seq
         query_params = self.mail_db.sequence_query_params(self.recipient_id,
-                                                          **sequence)
+                                                          **self._sequence(seq))
         messages = yield self.mail_db.message_query(**query_params)
         returnValue(messages)
 
+    def _sequence(self, seq):
+        if isinstance(seq, str):
+            return self.parse_sequence(seq)
+        elif seq is None:
+            return self.parse_sequence('')
+        return seq
+
+    def count_messages(self, seq):
+        """:rtype: twisted.internet.defer.Deferred"""
+        return self.mail_db.count_sequence(self.recipient_id,
+                                           **self._sequence(seq))
+
+    def stream_messages(self, seq, callback, page_size=50):
+        """
+        Pass the headers of the messages in a sequence to a callback, a page
+        at a time. See :meth:`MailDB.header_pages`.
+
+        :rtype: twisted.internet.defer.Deferred
+        """
+        return self.mail_db.header_pages(self.recipient_id, callback=callback,
+                                         page_size=page_size,
+                                         **self._sequence(seq))
+
     @inlineCallbacks
     def get_message(self, index):
         """:rtype: twisted.internet.defer.Deferred"""
@@ -532,27 +745,62 @@ class MailBox(object):
 
         :rtype: twisted.internet.defer.Deferred
         """
-        message = Message(
-            self.mail_db,
-            timestamp=unixtime(),
-            from_id=self.recipient_id,
-            from_name=from_name,
-            subject=subject,
-            body=body
-        )
-        for recipient_id, recipient_name in recipients.iteritems():
-            message.add_recipient(recipient_id, recipient_name)
-        d = self.mail_db.save_message(message)
+        d = self.send_messages(from_name, ((recipients, subject, body),))
+        d.addCallback(lambda messages: messages[0])
+        return d
+
+    def send_messages(self, from_name, mailings):
+        """
+        Send several messages from the mailbox owner at once, such as a mass
+        mailing. The messages are saved in one transaction, and each online
+        recipient is notified once of all their new messages.
+
+        :param from_name: The name to use for the sender.
+        :type from_name: str
+
+        :param mailings: (recipients, subject, body) for each message, with
+            recipients as for :meth:`send_message`.
+        :type mailings: list of tuple
+
+        :return: The saved messages (as deferred value).
+        :rtype: twisted.internet.defer.Deferred
+        """
+        timestamp = unixtime()
+        messages = []
+        for recipients, subject, body in mailings:
+            message = Message(
+                self.mail_db,
+                timestamp=timestamp,
+                from_id=self.recipient_id,
+                from_name=from_name,
+                subject=subject,
+                body=body
+            )
+            for recipient_id, recipient_name in recipients.iteritems():
+                message.add_recipient(recipient_id, recipient_name)
+            messages.append(message)
+        d = self.mail_db.save_messages(messages)
         d.addCallback(self._notify_recipients)
         return d
 
-    def _notify_recipients(self, message):
+    def _notify_recipients(self, messages):
         from mudslingcore.mail.recipient import MailRecipient
-        for rid, rname in message.recipients.iteritems():
+        new_mail = OrderedDict()
+        for message in messages:
+            for rid in message.recipients.iterkeys():
+                new_mail.setdefault(rid, []).append(message)
+        for rid, received in new_mail.iteritems():
             recipient = ObjRef(rid)
-            if recipient.is_valid(MailRecipient):
-                recipient.notify_new_mail(message)
-        return message
+            if not recipient.is_valid(MailRecipient):
+                continue
+            notify = recipient.notify_new_mail
+            if inspect.getargspec(notify).varargs is not None:
+                notify(*received)
+            else:
+                # Recipients written before notices covered several messages.
+                for message in received:
+                    notify(message)
+        return messages
 
 
 class Message(object):
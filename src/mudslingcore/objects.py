@@ -82,10 +82,7 @@ class CoreObject(AreaExportableBaseObject, SensoryMedium, InspectableObject):
         :rtype: mudslingcore.topography.Room
         """
         import mudslingcore.rooms
-        for loc in self.locations():
-            if loc.isa(mudslingcore.rooms.Room):
-                return loc
-        return None
+        return self.location_of_type(mudslingcore.rooms.Room)
 
     @property
     def in_a_room(self):
@@ -431,10 +428,10 @@ class Character(BaseCharacter, DescribableObject, SensingObject, HasGender,
             cmd.execute()
 
     def vision_sense(self, sensation):
-        self.msg(sensation.content_for(self))
+        self.msg(sensation.rendered_content_for(self))
 
     def hearing_sense(self, sensation):
-        content = self._format_msg(sensation.content_for(self))
+        content = sensation.rendered_content_for(self)
         if isinstance(sensation, Speech):
             msg = [sensation.origin, ' says, "{c', content, '{n".']
         elif 'bare' in sensation.traits:
@@ -3,6 +3,8 @@ Rooms and exits.
 """
 import itertools
 import re
+import heapq
+from collections import deque
 
 from mudsling.objects import Object as LocatedObject
 from mudsling.messages import Messages
@@ -12,6 +14,9 @@ from mudsling import parsers
 
 from mudsling import utils
 import mudsling.utils.string
+import mudsling.objects
+from mudsling.utils.hooks import hook
+from mudsling.utils.sequence import LRUCache
 
 from mudslingcore.objects import DescribableObject
 from mudslingcore.objsettings import ConfigurableObject, ObjSetting
@@ -38,6 +43,13 @@ class ExitCmd(Command):
         this.invoke(actor)
 
 
+#: Methods a room class must not override for its static view to be cached.
+_static_view_methods = ('desc_tokens', 'desc_title', 'describe_to',
+                        'text_describe_to', 'exits_as_seen_by')
+_standard_room_views = {}
+_standard_exit_names = {}
+
+
 # noinspection PyShadowingBuiltins
 class Room(DescribableObject):
     """
@@ -65,6 +77,11 @@ class Room(DescribableObject):
         #: :type: list of Exit
         self.exits = []
 
+    def __setattr__(self, name, value):
+        super(Room, self).__setattr__(name, value)
+        if not name.startswith('_v_'):
+            self.__dict__.pop('_v_view_cache', None)
+
     def exit_cmd(self, exit, actor=None):
         return exit._exit_cmd or self._exit_cmd or ExitCmd
 
@@ -79,6 +96,17 @@ class Room(DescribableObject):
         for exit_record in data.get('exits', []):
             exit = areas.import_area_object(exit_record, sandbox)
             self.exits.append(exit)
+        room_graph.invalidate()
+
+    @hook('before_deleted')
+    def __before_deleted(self):
+        room_graph.invalidate()
+
+    @hook('before_class_changed', 'after_class_changed')
+    def __class_changing(self, *a, **kw):
+        group = self.room_group
+        if group is not None:
+            group._invalidate_descendants()
 
     @property
     def room_group(self):
@@ -168,6 +196,8 @@ class Room(DescribableObject):
     def add_exit(self, exit, by=None):
         if exit.is_valid(Exit):
             self.exits.append(exit)
+            room_graph.invalidate(self)
+            self.__dict__.pop('_v_view_cache', None)
             if self.db.is_valid(exit.dest, cls=Room):
                 exit.dest.entrance_added(exit, by=by)
 
@@ -180,6 +210,8 @@ class Room(DescribableObject):
     def remove_exit(self, exit, delete=True, by=None):
         if exit in self.exits:
             self.exits.remove(exit)
+            room_graph.invalidate(self)
+            self.__dict__.pop('_v_view_cache', None)
             if exit.is_valid(Exit):
                 if self.db.is_valid(exit.dest, cls=Room):
                     exit.dest.entrance_removed(exit, by=by)
@@ -192,6 +224,33 @@ class Room(DescribableObject):
         :param exit: The exit that was removed.
         """
 
+    def path_to(self, dest):
+        """
+        Find the shortest series of exits leading from this room to another.
+
+        :param dest: The room to reach.
+        :type dest: Room
+
+        :return: List of exits to take, or None if dest cannot be reached.
+        :rtype: list of Exit or None
+        """
+        return room_graph.shortest_path(self, dest)
+
+    def can_reach(self, dest):
+        """
+        :return: Whether dest can be reached from this room through exits.
+        :rtype: bool
+        """
+        return room_graph.reachable(self, dest)
+
+    def rooms_within(self, hops):
+        """
+        :return: List of rooms (including this one) at most the given number
+            of exits away.
+        :rtype: list of Room
+        """
+        return room_graph.neighborhood(self, hops).keys()
+
     def desc_tokens(self, viewer):
         group = self.room_group
         tokens = {'name': self.desc_title(viewer)}
@@ -215,13 +274,8 @@ class Room(DescribableObject):
             return text
 
     def as_seen_by(self, obj):
-        tokens = self.desc_tokens(obj)
-        title_fmt = self.get_room_setting('room_title_format',
-                                          default='%(name)')
-        title = self._process_tokens(title_fmt, tokens)
-        desc = self._process_tokens(self.text_describe_to(obj), tokens)
+        title, desc, exits = self.static_view_for(obj)
         contents = self.contents_as_seen_by(obj)
-        exits = self.exits_as_seen_by(obj)
         out = '%s\n%s' % (title, desc)
         if contents:
             out += '\n\n' + contents
@@ -229,6 +283,82 @@ class Room(DescribableObject):
             out += '\n\n' + exits
         return out
 
+    def static_view_for(self, obj):
+        """
+        Render the parts of the room's view that do not depend on its
+        contents.
+
+        Results are cached per kind of viewer (see
+        :meth:`mudsling.objects.PossessableObject.msg_view_key`) until the room
+        or its exits change, any names change, or room group settings change.
+        Rooms, exits or groups customizing how these parts render are not
+        cached.
+
+        :return: The title, description and exits text.
+        :rtype: tuple of str
+        """
+        key = self._static_view_key(obj)
+        if key is not None:
+            cache = self.__dict__.get('_v_view_cache', None)
+            generation = (mudsling.objects.names_generation,
+                          group_settings_generation)
+            if cache is None or cache[0] != generation:
+                cache = (generation, {})
+                self._v_view_cache = cache
+            views = cache[1]
+            if key in views:
+                return views[key]
+        tokens = self.desc_tokens(obj)
+        title_fmt = self.get_room_setting('room_title_format',
+                                          default='%(name)')
+        view = (self._process_tokens(title_fmt, tokens),
+                self._process_tokens(self.text_describe_to(obj), tokens),
+                self.exits_as_seen_by(obj))
+        if key is not None:
+            views[key] = view
+        return view
+
+    def _static_view_key(self, obj):
+        """
+        :return: The key under which to cache the static view rendered for
+            the object, or None if it cannot be cached.
+        """
+        # Only possessed viewers see rooms often enough to be worth caching,
+        # and only they can say how they see things.
+        if obj is None or not getattr(obj, 'is_possessed', False):
+            return None
+        cls = self.__class__
+        try:
+            standard = _standard_room_views[cls]
+        except KeyError:
+            standard = all(getattr(cls, name).im_func
+                           is getattr(Room, name).im_func
+                           for name in _static_view_methods)
+            _standard_room_views[cls] = standard
+        if not standard:
+            return None
+        # Exits listing themselves differently may do so based on state (such
+        # as a door being open), which would not invalidate the cache.
+        for exit in self.exits:
+            real = exit._real_object()
+            if real is None:
+                return None
+            exit_cls = real.__class__
+            try:
+                standard = _standard_exit_names[exit_cls]
+            except KeyError:
+                standard = (exit_cls.exit_list_name.im_func
+                            is Exit.exit_list_name.im_func)
+                _standard_exit_names[exit_cls] = standard
+            if not standard:
+                return None
+        group = self.room_group
+        if (group is not None
+                and (group._real_object().__class__.room_desc_tokens.im_func
+                     is not RoomGroup.room_desc_tokens.im_func)):
+            return None
+        return obj.msg_view_key()
+
     def contents_as_seen_by(self, obj):
         """
         Return the contents of the room as seen by the passed object.
@@ -299,6 +429,18 @@ class Exit(areas.AreaExportableBaseObject):
         },
     })
 
+    def __setattr__(self, name, value):
+        super(Exit, self).__setattr__(name, value)
+        if name in ('source', 'dest'):
+            room_graph.invalidate()
+
+    @hook('before_deleted', 'after_class_changed')
+    def __topology_changed(self, *a, **kw):
+        if self.source is not None:
+            room_graph.invalidate(self.source)
+        else:
+            room_graph.invalidate()
+
     def area_export(self, sandbox):
         export = super(Exit, self).area_export(sandbox)
         if self.game.db.is_valid(self.source, areas.AreaExportableBaseObject):
@@ -444,6 +586,180 @@ class Exit(areas.AreaExportableBaseObject):
             return getattr(c, fname)(*a, **kw)
 
 
+class RoomGraph(object):
+    """
+    Index of the exits leading from each room to others, supporting path and
+    reachability queries.
+
+    A room's adjacency is read from its exits on first use and kept until the
+    room adds or removes an exit. Query results are cached until any change
+    in the topology, which also happens when an exit's source or destination
+    is reassigned, or a room is imported or deleted.
+
+    Rooms expose the common queries to Python and Lua code alike through
+    :meth:`Room.path_to`, :meth:`Room.can_reach` and :meth:`Room.rooms_within`.
+    """
+    def __init__(self, cache_size=1024):
+        #: :type: dict of (Room, tuple)
+        self._adjacency = {}
+        self._paths = LRUCache(cache_size)
+        self._reachable = LRUCache(cache_size)
+
+    def invalidate(self, room=None):
+        """
+        Discard cached results after a change in topology.
+
+        :param room: The room whose exits changed, if only one did.
+        :type room: Room or None
+        """
+        if room is None:
+            self._adjacency.clear()
+        else:
+            self._adjacency.pop(room.ref(), None)
+        self._paths.clear()
+        self._reachable.clear()
+
+    def exits_from(self, room):
+        """
+        :return: The valid exits from a room paired with the room each leads
+            to.
+        :rtype: tuple of (Exit, Room)
+        """
+        room = room.ref()
+        try:
+            return self._adjacency[room]
+        except KeyError:
+            edges = ()
+            if room.is_valid(Room):
+                edges = tuple((e, e.dest) for e in room.exits
+                              if e.is_valid(Exit)
+                              and e.dest is not None
+                              and e.dest.is_valid(Room))
+            self._adjacency[room] = edges
+            return edges
+
+    def neighborhood(self, room, hops):
+        """
+        Find the rooms at most the given number of exits away from a room.
+
+        :return: Dict of the rooms found mapped to their distance in exits.
+        :rtype: dict of (Room, int)
+        """
+        room = room.ref()
+        found = {room: 0}
+        frontier = [room]
+        for distance in xrange(1, hops + 1):
+            next_frontier = []
+            for current in frontier:
+                for exit, dest in self.exits_from(current):
+                    if dest not in found:
+                        found[dest] = distance
+                        next_frontier.append(dest)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return found
+
+    def reachable_from(self, room):
+        """
+        :return: The set of rooms reachable from the room, including itself.
+        :rtype: frozenset of Room
+        """
+        room = room.ref()
+        reachable = self._reachable.get(room)
+        if reachable is None:
+            found = {room}
+            pending = [room]
+            while pending:
+                for exit, dest in self.exits_from(pending.pop()):
+                    if dest not in found:
+                        found.add(dest)
+                        pending.append(dest)
+            reachable = self._reachable[room] = frozenset(found)
+        return reachable
+
+    def reachable(self, source, dest):
+        """
+        :return: Whether dest can be reached from source through exits.
+        :rtype: bool
+        """
+        return dest.ref() in self.reachable_from(source)
+
+    def shortest_path(self, source, dest, heuristic=None):
+        """
+        Find a path with the fewest exits from one room to another.
+
+        Searches breadth-first, or using A* if given a heuristic.
+
+        :param source: The room to start from.
+        :type source: Room
+        :param dest: The room to reach.
+        :type dest: Room
+        :param heuristic: Optional callable estimating the number of exits
+            between a room and dest, without overestimating. It is passed the
+            room and dest.
+
+        :return: List of exits to take, or None if dest cannot be reached.
+        :rtype: list of Exit or None
+        """
+        source = source.ref()
+        dest = dest.ref()
+        if heuristic is None:
+            key = (source, dest)
+            path = self._paths.get(key, False)
+            if path is False:
+                path = self._paths[key] = self._bfs(source, dest)
+        else:
+            path = self._a_star(source, dest, heuristic)
+        return None if path is None else list(path)
+
+    def _bfs(self, source, dest):
+        came_from = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == dest:
+                return self._walk_back(came_from, dest)
+            for exit, room in self.exits_from(current):
+                if room not in came_from:
+                    came_from[room] = (current, exit)
+                    queue.append(room)
+        return None
+
+    def _a_star(self, source, dest, heuristic):
+        came_from = {source: None}
+        cost = {source: 0}
+        counter = itertools.count()  # Keeps heap entries from tying on rooms.
+        heap = [(heuristic(source, dest), next(counter), source)]
+        while heap:
+            current = heapq.heappop(heap)[2]
+            if current == dest:
+                return self._walk_back(came_from, dest)
+            for exit, room in self.exits_from(current):
+                new_cost = cost[current] + 1
+                if room not in cost or new_cost < cost[room]:
+                    cost[room] = new_cost
+                    came_from[room] = (current, exit)
+                    estimate = new_cost + heuristic(room, dest)
+                    heapq.heappush(heap, (estimate, next(counter), room))
+        return None
+
+    @staticmethod
+    def _walk_back(came_from, dest):
+        path = []
+        step = came_from[dest]
+        while step is not None:
+            room, exit = step
+            path.append(exit)
+            step = came_from[room]
+        path.reverse()
+        return tuple(path)
+
+
+#: The room graph shared by all rooms.
+room_graph = RoomGraph()
+
+
 class MatchExit(parsers.MatchObject):
     """
     Parser to match exits in the actor's current room.
@@ -467,6 +783,22 @@ class MatchExit(parsers.MatchObject):
         return room.match_exits(input)
 
 
+#: Incremented whenever a room group changes in a way that may affect which
+#: value its descendants inherit for a setting.
+group_settings_generation = 0
+
+_not_inherited = object()
+_unresolved = object()
+
+
+def invalidate_group_settings():
+    """
+    Discard all resolved room group settings.
+    """
+    global group_settings_generation
+    group_settings_generation += 1
+
+
 class room_group_setting(object):
     """
     Descriptor to make room group setting attributes easier to implement.
@@ -532,13 +864,44 @@ class RoomGroup(areas.AreaExportableObject, ConfigurableObject):
         if attr in self.__dict__:
             return getattr(self, attr)
         # Defined somewhere in parent room groups?
-        for grp in self.all_parent_room_groups:
-            if attr in grp.__dict__:
-                return getattr(grp, attr)
+        inherited = self._inherited_settings()
+        value = inherited.get(attr, _unresolved)
+        if value is _unresolved:
+            value = _not_inherited
+            for grp in self.all_parent_room_groups:
+                if attr in grp.__dict__:
+                    value = getattr(grp, attr)
+                    break
+            inherited[attr] = value
+        if value is not _not_inherited:
+            return value
         # Use implicit value.
         implicit = getattr(self, attr, None)
         return default if implicit is None else implicit
 
+    def _inherited_settings(self):
+        """
+        Get the cache of values this group inherits from its parent groups,
+        keyed by attribute name.
+
+        :rtype: dict
+        """
+        cache = self.__dict__.get('_v_inherited_settings', None)
+        if cache is None or cache[0] != group_settings_generation:
+            cache = (group_settings_generation, {})
+            self._v_inherited_settings = cache
+        return cache[1]
+
+    def __setattr__(self, name, value):
+        super(RoomGroup, self).__setattr__(name, value)
+        if not name.startswith('_v_'):
+            invalidate_group_settings()
+
+    def __delattr__(self, name):
+        super(RoomGroup, self).__delattr__(name)
+        if not name.startswith('_v_'):
+            invalidate_group_settings()
+
     def room_desc_tokens(self, room, viewer):
         return {}
 
@@ -555,11 +918,11 @@ class RoomGroup(areas.AreaExportableObject, ConfigurableObject):
     @property
     def all_parent_room_groups(self):
         """:rtype: list of RoomGroup"""
-        parent = self.parent_room_group
         parents = []
-        while parent is not None:
-            parents.append(parent)
-            parent = parent.parent_room_group
+        for location in self.locations():
+            if not location.isa(RoomGroup):
+                break
+            parents.append(location)
         return parents
 
     @property
@@ -581,19 +944,66 @@ class RoomGroup(areas.AreaExportableObject, ConfigurableObject):
     @property
     def all_room_groups(self):
         """
-        :return: List of all room groups contained at any level.
+        :return: List of all room groups contained at any level, child groups
+            first, followed by the groups within each of them in turn.
         :rtype: list of RoomGroup
         """
-        groups = self.child_room_groups
-        groups.extend(itertools.chain.from_iterable(g.all_room_groups
-                                                    for g in groups))
-        return groups
+        return list(self._descendant_cache()[1])
 
     @property
     def all_rooms(self):
         """
-        :return: List of all rooms contained at any level.
+        :return: List of all rooms contained at any level: the child rooms,
+            followed by those of each group in :attr:`all_room_groups`.
         :rtype: list of Room
         """
-        return itertools.chain.from_iterable(g.child_rooms
-                                             for g in self.all_room_groups)
+        return list(self._descendant_cache()[0])
+
+    def encloses(self, obj):
+        """
+        Whether a room or room group is contained within this group at any
+        level.
+
+        :rtype: bool
+        """
+        return obj.ref() in self._descendant_cache()[2]
+
+    def _descendant_cache(self):
+        """
+        Get the rooms and room groups contained within this group at any
+        level, in hierarchy order, and the set of both. The result is built
+        from the caches of child groups, and is discarded whenever a room or
+        group enters or leaves this group or any group within it.
+
+        :rtype: tuple of (tuple, tuple, frozenset)
+        """
+        cache = self.__dict__.get('_v_descendants', None)
+        if cache is None:
+            rooms = self.child_rooms
+            groups = self.child_room_groups
+            for group in tuple(groups):
+                groups.extend(group._descendant_cache()[1])
+            for group in groups:
+                rooms.extend(group.child_rooms)
+            cache = (tuple(rooms), tuple(groups), frozenset(rooms + groups))
+            self._v_descendants = cache
+        return cache
+
+    def _invalidate_descendants(self):
+        """
+        Discard the cached descendants of this group and its parent groups.
+        """
+        self.__dict__.pop('_v_descendants', None)
+        for group in self.all_parent_room_groups:
+            group._real_object().__dict__.pop('_v_descendants', None)
+
+    @hook('after_content_added', 'after_content_removed')
+    def __contents_changed(self, obj, *a, **kw):
+        if obj.isa(Room) or obj.isa(RoomGroup):
+            self._invalidate_descendants()
+
+    @hook('before_class_changed', 'after_class_changed')
+    def __class_changing(self, *a, **kw):
+        group = self.parent_room_group
+        if group is not None:
+            group._invalidate_descendants()
@@ -0,0 +1,77 @@
+import os
+import re
+import sqlite3
+import logging
+
+from yoyo import step, transaction
+
+
+step("""
+    CREATE TABLE history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+        channel_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL,
+        source TEXT,
+        text TEXT
+    );
+""")
+
+step("""
+    CREATE INDEX history_channel_timestamp ON history (channel_id, timestamp);
+""")
+
+# Full-text search needs an SQLite built with FTS5. Without it, these steps
+# are skipped and searches fall back to LIKE.
+transaction(
+    step("""
+        CREATE VIRTUAL TABLE history_fts USING fts5(
+            text,
+            content='history',
+            content_rowid='id'
+        );
+    """),
+    step("""
+        CREATE TRIGGER history_fts_insert AFTER INSERT ON history BEGIN
+            INSERT INTO history_fts (rowid, text) VALUES (new.id, new.text);
+        END;
+    """),
+    step("""
+        CREATE TRIGGER history_fts_delete AFTER DELETE ON history BEGIN
+            INSERT INTO history_fts (history_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END;
+    """),
+    ignore_errors='apply'
+)
+
+
+def import_channel_logs(conn):
+    """
+    Import the per-channel log files that preceded the consolidated history
+    database. They are expected in the channel_logs directory alongside the
+    history database, and are left in place.
+    """
+    db_file = [r[2] for r in conn.execute('PRAGMA database_list')
+               if r[1] == 'main'][0]
+    logs_dir = os.path.join(os.path.dirname(db_file), 'channel_logs')
+    if not db_file or not os.path.isdir(logs_dir):
+        return
+    filename_re = re.compile(r'-(\d+)\.sqlite$')
+    for filename in sorted(os.listdir(logs_dir)):
+        m = filename_re.search(filename)
+        if m is None:
+            continue
+        channel_id = int(m.group(1))
+        old = sqlite3.connect(os.path.join(logs_dir, filename))
+        try:
+            rows = old.execute('SELECT ?, timestamp, source, text FROM log'
+                               ' ORDER BY rowid', (channel_id,))
+            conn.executemany('INSERT INTO history'
+                             ' (channel_id, timestamp, source, text)'
+                             ' VALUES (?, ?, ?, ?)', rows)
+        except sqlite3.Error:
+            logging.exception('Could not import channel log %s' % filename)
+        finally:
+            old.close()
+
+step(import_channel_logs)
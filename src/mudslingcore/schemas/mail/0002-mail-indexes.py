@@ -0,0 +1,49 @@
+from yoyo import step, transaction
+
+
+step("""
+    CREATE INDEX message_recipient_mailbox
+    ON message_recipient (recipient_id, mailbox_index, read, message_id);
+""")
+
+step("""
+    CREATE INDEX message_recipient_read
+    ON message_recipient (recipient_id, read, mailbox_index, message_id);
+""")
+
+# Full-text search needs an SQLite built with FTS5. Without it, these steps
+# are skipped and subject/body filters fall back to LIKE.
+transaction(
+    step("""
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            subject,
+            body,
+            content='messages',
+            content_rowid='message_id'
+        );
+    """),
+    step("""
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, subject, body)
+            VALUES (new.message_id, new.subject, new.body);
+        END;
+    """),
+    step("""
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, subject, body)
+            VALUES ('delete', old.message_id, old.subject, old.body);
+        END;
+    """),
+    step("""
+        CREATE TRIGGER messages_fts_update AFTER UPDATE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, subject, body)
+            VALUES ('delete', old.message_id, old.subject, old.body);
+            INSERT INTO messages_fts (rowid, subject, body)
+            VALUES (new.message_id, new.subject, new.body);
+        END;
+    """),
+    step("""
+        INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');
+    """),
+    ignore_errors='apply'
+)
@@ -1,5 +1,6 @@
 from mudsling.storage import PersistentSlots
 from mudsling.objects import Object
+from mudsling.messages import ViewRenderCache
 
 
 class Sensation(PersistentSlots):
@@ -11,7 +12,8 @@ class Sensation(PersistentSlots):
     * bitter
     * soft
     """
-    __slots__ = ('content', 'origin', 'traits')
+    __slots__ = ('content', 'origin', 'traits', 'renderer')
+    _transient_vars = ['renderer']
 
     sensed_by = set()
     """Which senses can detect this sensation?"""
@@ -20,6 +22,7 @@ class Sensation(PersistentSlots):
         self.content = content
         self.origin = origin
         self.traits = set(traits)
+        self.renderer = None
 
     def content_for(self, senser):
         if isinstance(self.content, dict):
@@ -27,6 +30,17 @@ class Sensation(PersistentSlots):
                     else self.content['*'])
         return self.content
 
+    def rendered_content_for(self, senser):
+        """Render the content for the senser, sharing the rendering with other
+        sensers with the same view while the sensation is propagating.
+
+        :rtype: str
+        """
+        content = self.content_for(senser)
+        if getattr(self, 'renderer', None) is None:
+            return senser._format_msg(content)
+        return self.renderer.render(senser, content)
+
 
 class Sound(Sensation):
     """A sension which can be heard."""
@@ -65,16 +79,24 @@ class SensoryMedium(Object):
         sensed_by = []
         exclude = exclude or []
         senses = self.senses.intersection(sensation.sensed_by)
-        for obj in (o for o in self._contents if o not in exclude):
-            if obj.isa(SensingObject) and obj.has_any_sense(senses):
-                obj.sense(sensation)
-                sensed_by.append(obj)
-        if (self.propagate_sensation_up(sensation) and self.has_location
-                and self.location.isa(SensoryMedium)):
-            #: :type: mudslingcore.senses.SensoryMedium
-            container = self.location
-            sensed_by.extend(container.propagate_sensation(sensation,
-                                                           exclude=exclude))
+        # Share renderings of the sensation across the whole propagation.
+        outermost = getattr(sensation, 'renderer', None) is None
+        if outermost:
+            sensation.renderer = ViewRenderCache()
+        try:
+            for obj in (o for o in self._contents if o not in exclude):
+                if obj.isa(SensingObject) and obj.has_any_sense(senses):
+                    obj.sense(sensation)
+                    sensed_by.append(obj)
+            if (self.propagate_sensation_up(sensation) and self.has_location
+                    and self.location.isa(SensoryMedium)):
+                #: :type: mudslingcore.senses.SensoryMedium
+                container = self.location
+                sensed_by.extend(container.propagate_sensation(
+                    sensation, exclude=exclude))
+        finally:
+            if outermost:
+                sensation.renderer = None
         return sensed_by
 
     def propagate_sensation_up(self, sensation):